@@ -2,10 +2,11 @@
 # Copyright (c) 2014 Ryan Castellucci <code@ryanc.org>
 # See LICENSE.txt for license terms
 
-from polynomial import Polynomial
-from rscoder import RSCoder
+from polynomial import Polynomial, SparsePolynomial
+from rscoder import RSCoder, DecodeError
 from mapper import Mapper
 from pfint import PFint
+from interleave import InterleavedCoder
 
 """This module implements Reed-Solomon Encoding.
 It supports arbitrary configurations for n and k, the codeword length and
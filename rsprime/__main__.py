@@ -3,11 +3,56 @@
 # See LICENSE.txt for license terms
 
 import sys
+
+if len(sys.argv) > 1 and sys.argv[1] == 'loadgen':
+    from loadgen import main
+    sys.exit(main(sys.argv[2:]))
+
+if len(sys.argv) > 1 and sys.argv[1] in ('protect', 'repair'):
+    from sidecar import main
+    sys.exit(main(sys.argv[1:]))
+
+if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+    from server import main
+    sys.exit(main(sys.argv[2:]))
+
+import socket
+
+from client import connect, RemoteError
+
+def remote(data):
+    """Runs the command on the daemon if one of ours is running, it has its
+    coders ready. Returns the lines to print, or None to run it here: when
+    the daemon doesn't serve the code, when the connection breaks, and when
+    the request fails, so the error is reported the same way either way."""
+    coder = connect(code=(59,58,52))
+    if coder is None:
+        return None
+    try:
+        if "-d" in sys.argv:
+            valid, message = coder.pipeline([('verify', data), ('decode', data)])
+        else:
+            valid, message = None, coder.encode(data)
+    except (socket.error, ValueError):
+        return None
+    finally:
+        coder.close()
+    if isinstance(message, RemoteError):
+        return None
+    if valid is False:
+        return ['WARNING: errors present, correction attempted', message]
+    return [message]
+
+data = sys.argv[-1]
+lines = remote(data)
+if lines is not None:
+    for line in lines:
+        print line
+    sys.exit(0)
+
 from rscoder import RSCoder
 
-import sys
 coder = RSCoder(59,58,52)
-data = sys.argv[-1]
 if "-d" in sys.argv:
     if coder.verify(data) is False:
         print 'WARNING: errors present, correction attempted'
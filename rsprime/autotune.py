@@ -0,0 +1,219 @@
+# encoding: UTF-8
+# Copyright (c) 2014 Ryan Castellucci <code@ryanc.org>
+# See LICENSE.txt for license terms
+
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+from polynomial import Polynomial
+from swar import SWAR
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+"""Picks the fastest kernel for each operation of an RSCoder.
+
+Which way of computing parity, syndromes or error locations is fastest
+depends on b, n and k, on the Python build and on what is installed, so
+RSCoder(..., engine='auto') times every kernel that works for its code on a
+few random words and keeps the fastest of each. The results can be kept in
+a JSON profile file, keyed on b, n and k, so later coders skip the timing.
+Many processes can share one file: each adds its entry under a lock, to
+what is in the file at that time, and replaces the file in one rename.
+
+The kernels are
+    encode:    'poly'   Polynomial objects, multiply and divide
+               'int'    division register on plain ints
+               'swar'   one big int multiplication, see swar.py
+               'codegen' division register compiled for the code, see
+                        codegen.py
+    syndromes: 'direct' Horner's rule at the n-k points on plain ints
+               'ntt'    number theoretic transform, see ntt.py
+               'swar'   one big int multiplication
+               'numpy'  matrix product, if numpy is installed
+    roots:     'direct' evaluate sigma at every point
+               'ntt'    all points with one transform, for locators of degree
+                        at least the transform's cost
+"""
+
+KERNELS = {
+    'encode': ('poly', 'int', 'swar', 'codegen'),
+    'syndromes': ('direct', 'ntt', 'swar', 'numpy'),
+    'roots': ('direct', 'ntt'),
+}
+
+def _key(coder):
+    return "%d,%d,%d" % (coder.b, coder.n, coder.k)
+
+def available(coder):
+    "Returns a dict of the kernels each operation can use for this coder"
+    kernels = {
+        'encode': ['poly', 'int', 'codegen'],
+        'syndromes': ['direct'],
+        'roots': ['direct'],
+    }
+    try:
+        SWAR(coder.b, 2 * coder.n)
+    except ValueError:
+        pass
+    else:
+        kernels['encode'].append('swar')
+        kernels['syndromes'].append('swar')
+    if coder.ntt is None or not coder.ntt.checked:
+        # Keep it, it's slow to check for large b
+        coder.ntt = coder._checked_ntt(coder.ntt)
+    if coder.ntt is not None:
+        kernels['syndromes'].append('ntt')
+        # _chien_search only uses the transform for locators of degree at
+        # least its cost, if no correctable locator is that long 'ntt' would
+        # time the direct search
+        if coder.ntt.cost < (coder.n - coder.k) // 2 + 1:
+            kernels['roots'].append('ntt')
+    # The products are summed in 64 bit ints
+    if numpy is not None and coder.n * (coder.b - 1) ** 2 < 1 << 63:
+        kernels['syndromes'].append('numpy')
+    return kernels
+
+def _best(func, args, repeat):
+    "Best of repeat runs of func over every item of args, per item"
+    best = None
+    for _ in xrange(repeat):
+        start = time.time()
+        for a in args:
+            func(a)
+        elapsed = (time.time() - start) / len(args)
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def calibrate(coder, batch=20, repeat=3):
+    """Times every available kernel on batch random inputs, the best of
+    repeat runs. Returns a profile, a dict with the chosen 'kernels' and the
+    'timings' in seconds per call of each kernel of each operation. Leaves
+    the coder using the chosen kernels."""
+    b, n, k = coder.b, coder.n, coder.k
+    kernels = available(coder)
+    rnd = random.Random(b * n + k)
+
+    messages = [coder.mapper.encode([rnd.randrange(b) for _ in xrange(k)])
+            for _ in xrange(batch)]
+    words = [[rnd.randrange(b) for _ in xrange(n)] for _ in xrange(batch)]
+    # Locators of as many errors as the code corrects, the case where the
+    # root search costs the most
+    one = Polynomial((coder.PFint(1),))
+    locators = []
+    for _ in xrange(batch):
+        sigma = one
+        for j in rnd.sample(xrange(n), (n - k) // 2):
+            # sigma *= 1 - α^j z
+            sigma = sigma * Polynomial((-coder.PFint(coder.exptable[j]), coder.PFint(1)))
+        locators.append(sigma)
+
+    timings = {}
+    ops = {
+        'encode': (lambda m: coder.encode(m, nostrip=True), messages),
+        'syndromes': (coder._syndrome_list, words),
+        'roots': (lambda s: coder._chien_search(s, n), locators),
+    }
+    for op, (func, args) in ops.items():
+        timings[op] = {}
+        for name in kernels[op]:
+            coder._prepare_kernel(op, name)
+            coder.kernels[op] = name
+            timings[op][name] = _best(func, args, repeat)
+
+    choices = dict((op, min(times, key=times.get)) for op, times in timings.items())
+    coder._use_kernels(choices)
+    return {
+        'kernels': choices,
+        'timings': timings,
+        'batch': batch,
+        'python': sys.version.split()[0],
+    }
+
+def load_profile(path):
+    """Returns the profiles stored at path, an empty dict if there is no
+    file or it can't be read"""
+    try:
+        with open(path) as f:
+            profiles = json.load(f)
+    except (IOError, ValueError):
+        return {}
+    if not isinstance(profiles, dict):
+        return {}
+    return profiles
+
+def save_profile(path, profiles):
+    """Writes profiles to path, by way of a temporary file of our own in the
+    same directory, so readers see either the old file or the new one"""
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + '.',
+            suffix='.tmp', dir=os.path.dirname(path) or '.')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(profiles, f, indent=2, sort_keys=True)
+        os.rename(tmp, path)
+    except:
+        os.unlink(tmp)
+        raise
+
+@contextmanager
+def _locked(path):
+    "Holds an exclusive lock on path + '.lock', where fcntl is available"
+    if fcntl is None:
+        yield
+        return
+    with open(path + '.lock', 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def add_profile(path, key, profile):
+    """Adds profile to the file at path under key, keeping the entries other
+    processes wrote since we read it"""
+    with _locked(path):
+        profiles = load_profile(path)
+        profiles[key] = profile
+        save_profile(path, profiles)
+
+def tune(coder, path=None):
+    """Sets up coder with the fastest kernels, from the profile file at path
+    if it has an entry for this code and Python version that the coder can
+    use, else by running calibrate() and adding the result to the file.
+    Returns the profile."""
+    profiles = load_profile(path) if path else {}
+    profile = profiles.get(_key(coder))
+    if isinstance(profile, dict) and profile.get('python') == sys.version.split()[0]:
+        try:
+            choices = dict((str(op), str(name))
+                    for op, name in profile['kernels'].items())
+            coder._use_kernels(choices)
+        except (KeyError, AttributeError, ValueError):
+            # Written where numpy was installed, for example, or garbled
+            pass
+        else:
+            return profile
+
+    profile = calibrate(coder)
+    if path:
+        try:
+            add_profile(path, _key(coder), profile)
+        except (IOError, OSError):
+            # The coder is tuned, only later ones will have to time again
+            pass
+    return profile
+
+# vim: sw=4 ts=4 et ai si bg=dark
@@ -0,0 +1,148 @@
+# encoding: UTF-8
+# Copyright (c) 2014 Ryan Castellucci <code@ryanc.org>
+# See LICENSE.txt for license terms
+
+import json
+import os
+import socket
+import stat
+import struct
+import tempfile
+
+"""Client for the rsprime daemon, see server.py.
+
+This module only imports the standard library, so a short lived process
+that finds the daemon running never pays for importing rscoder or building
+its tables.
+
+Frames on the socket are a 4 byte big endian length followed by that many
+bytes of JSON. A request is an object with the op ('encode', 'verify' or
+'decode'), the data, optionally b, n and k to pick one of the daemon's
+coders, and nostrip. The response is {"result": ...} or {"error": type,
+"message": text}. Responses come back in the order of the requests, so a
+client can send many before reading any.
+"""
+
+_length = struct.Struct('>I')
+
+# Frames larger than this are refused by both ends
+MAX_FRAME = 1 << 24
+
+def default_path():
+    "The socket path from $RSPRIME_SOCKET, or one in the temp directory"
+    path = os.environ.get('RSPRIME_SOCKET')
+    if path:
+        return path
+    return os.path.join(tempfile.gettempdir(), 'rsprime-%d.sock' % os.getuid())
+
+class RemoteError(ValueError):
+    """An operation failed in the daemon. kind is the name of the exception
+    it raised there, DecodeError for words that can't be corrected."""
+    def __init__(self, kind, message):
+        ValueError.__init__(self, "%s: %s" % (kind, message))
+        self.kind = kind
+
+def send_frame(sock, payload):
+    sock.sendall(_length.pack(len(payload)) + payload)
+
+def _recv_exact(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 16))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return ''.join(chunks)
+
+def recv_frame(sock):
+    "Returns the next frame's payload, or None at the end of the stream"
+    header = _recv_exact(sock, _length.size)
+    if header is None:
+        return None
+    size, = _length.unpack(header)
+    if size > MAX_FRAME:
+        raise ValueError("Frame of %d bytes is too large" % size)
+    payload = _recv_exact(sock, size)
+    if payload is None:
+        raise ValueError("Connection closed in the middle of a frame")
+    return payload
+
+class Client(object):
+    def __init__(self, path=None, code=None):
+        """Connects to the daemon at path, by default default_path().
+        code is a (b, n, k) tuple naming the coder to use, by default the
+        daemon's first one. Raises socket.error if no daemon is listening,
+        or if the socket isn't one of ours."""
+        self.path = path or default_path()
+        self.code = code
+        # The default path is in a shared directory, where anyone could have
+        # bound it first and would then see all our data
+        info = os.lstat(self.path) if os.path.lexists(self.path) else None
+        if info is not None and (not stat.S_ISSOCK(info.st_mode)
+                or info.st_uid != os.getuid()):
+            raise socket.error("%s is not a socket owned by this user" % self.path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.sock.connect(self.path)
+        except socket.error:
+            self.sock.close()
+            raise
+
+    def _request(self, op, data, nostrip=False):
+        request = {'op': op, 'data': data}
+        if nostrip:
+            request['nostrip'] = True
+        if self.code is not None:
+            request['b'], request['n'], request['k'] = self.code
+        return json.dumps(request)
+
+    def pipeline(self, requests):
+        """Sends every request, a list of (op, data) or (op, data, nostrip)
+        tuples, before reading the responses. Returns the list of results,
+        or of RemoteError instances for the ones that failed."""
+        requests = list(requests)
+        payloads = [self._request(*req) for req in requests]
+        self.sock.sendall(''.join(_length.pack(len(p)) + p for p in payloads))
+        results = []
+        for _ in requests:
+            payload = recv_frame(self.sock)
+            if payload is None:
+                raise ValueError("Daemon closed the connection")
+            response = json.loads(payload)
+            if 'error' in response:
+                results.append(RemoteError(response['error'], response['message']))
+            else:
+                result = response['result']
+                if isinstance(result, unicode):
+                    result = result.encode('utf-8')
+                results.append(result)
+        return results
+
+    def _call(self, op, data, nostrip=False):
+        result, = self.pipeline([(op, data, nostrip)])
+        if isinstance(result, RemoteError):
+            raise result
+        return result
+
+    def encode(self, message, nostrip=False):
+        return self._call('encode', message, nostrip)
+
+    def verify(self, code):
+        return self._call('verify', code)
+
+    def decode(self, code, nostrip=False):
+        return self._call('decode', code, nostrip)
+
+    def close(self):
+        self.sock.close()
+
+def connect(path=None, code=None):
+    """Returns a Client for the daemon at path, or None if it isn't running
+    or the socket belongs to someone else"""
+    try:
+        return Client(path, code)
+    except socket.error:
+        return None
+
+# vim: sw=4 ts=4 et ai si bg=dark
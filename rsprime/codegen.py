@@ -0,0 +1,79 @@
+# encoding: UTF-8
+# Copyright (c) 2014 Ryan Castellucci <code@ryanc.org>
+# See LICENSE.txt for license terms
+
+import random
+import threading
+
+"""Parity functions generated for one generator polynomial.
+
+RSCoder._parity_direct keeps the division register in a list and loops over
+the generator taps for every message symbol. parity_function() writes out
+the same register as n-k local variables, with the taps as constants, and
+compiles it. Each message symbol is then a single tuple assignment:
+
+    fb = (c + r0) % 59
+    r0, r1, r2, r3 = r1 + fb*53, r2 + fb*42, r3 + fb*7, fb*9
+
+Only the feedback is reduced modulo b as it goes, the registers are reduced
+once at the end. A value passes through at most n-k registers before it
+feeds back, so they stay below (n-k)*b^2.
+
+Functions are cached on b and the taps, so coders for the same code share
+one. Each has the source it was compiled from as its source attribute.
+"""
+
+_cache = {}
+_lock = threading.Lock()
+
+def _source(b, taps):
+    m = len(taps)
+    regs = ['r%d' % i for i in xrange(m)]
+    terms = []
+    for i, t in enumerate(taps):
+        if t == 0:
+            product = None
+        elif t == 1:
+            product = 'fb'
+        else:
+            product = 'fb*%d' % t
+        ahead = regs[i+1] if i + 1 < m else None
+        terms.append(' + '.join(x for x in (ahead, product) if x) or '0')
+
+    lines = [
+        "def parity(message):",
+        "    %s = %s" % (', '.join(regs), ', '.join(['0'] * m)),
+        "    for c in message:",
+        "        fb = (c + r0) %% %d" % b,
+        "        %s = %s" % (', '.join(regs), ', '.join(terms)),
+        "    return [%s]" % ', '.join('-%s %% %d' % (r, b) for r in regs),
+    ]
+    return '\n'.join(lines) + '\n'
+
+def parity_function(b, taps):
+    """Returns a function mapping a message, a sequence of symbol values, to
+    its parity symbols, for the parity register with feedback taps, see
+    RSCoder.generator_taps"""
+    key = (b, tuple(taps))
+    with _lock:
+        func = _cache.get(key)
+        if func is None:
+            source = _source(b, key[1])
+            namespace = {}
+            exec compile(source, '<rsprime parity %d>' % b, 'exec') in namespace
+            func = namespace['parity']
+            func.source = source
+            _cache[key] = func
+        return func
+
+def check(func, reference, b, k, trials=20):
+    """True if func and reference agree on trials random messages of up to
+    k symbols"""
+    rnd = random.Random(b * k)
+    for _ in xrange(trials):
+        message = [rnd.randrange(b) for _ in xrange(rnd.randint(0, k))]
+        if func(message) != reference(message):
+            return False
+    return True
+
+# vim: sw=4 ts=4 et ai si bg=dark
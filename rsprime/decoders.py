@@ -0,0 +1,147 @@
+# encoding: UTF-8
+# Copyright (c) 2014 Ryan Castellucci <code@ryanc.org>
+# See LICENSE.txt for license terms
+
+from polynomial import Polynomial
+
+"""Key equation solvers used by RSCoder.decode.
+
+A decoder backend takes the syndrome polynomial of a received word and
+returns the error locator polynomial sigma and the error evaluator polynomial
+omega, normalized so that sigma(0) = 1 and
+
+    (1 + S(z)) * sigma(z) = omega(z)  mod z^(n-k+1)
+
+RSCoder then finds the roots of sigma with _chien_search and the error
+magnitudes with _forney, so every backend yields the same corrections.
+"""
+
+class DecoderBackend(object):
+    "Base class for key equation solvers"
+    name = None
+
+    def solve(self, coder, sz):
+        """Given the syndrome polynomial sz as returned by
+        RSCoder._syndromes, returns (sigma, omega) as Polynomial objects, or
+        (None, None) if no locator of degree at most (n-k)/2 solves the key
+        equation"""
+        raise NotImplementedError
+
+    def __repr__(self):
+        return "%s()" % self.__class__.__name__
+
+class BerlekampMassey(DecoderBackend):
+    "The Berlekamp-Massey algorithm, as implemented by RSCoder"
+    name = 'berlekamp-massey'
+
+    def solve(self, coder, sz):
+        return coder._berlekamp_massey(sz)
+
+class Euclidean(DecoderBackend):
+    """Sugiyama's extended Euclidean algorithm, run on plain lists of ints
+    modulo b rather than on Polynomial objects.
+
+    Lists hold coefficients in order of increasing power here, the opposite
+    of Polynomial."""
+    name = 'euclidean'
+
+    def solve(self, coder, sz):
+        p = coder.b
+        m = coder.n - coder.k
+
+        # S'(z) = S_1 + S_2 z + ... + S_m z^(m-1), i.e. S(z) / z
+        s = _trim([int(sz.get_coefficient(l)) for l in xrange(1, m+1)])
+
+        # Run the Euclidean algorithm on z^m and S'(z) until the remainder
+        # has degree below m/2, keeping track of the Bezout coefficient of
+        # S'(z). That coefficient is the error locator.
+        r0, r1 = [0] * m + [1], s
+        t0, t1 = [0], [1]
+        while 2 * _degree(r1) >= m:
+            q, r = _divmod(r0, r1, p)
+            r0, r1 = r1, r
+            t0, t1 = t1, _sub(t0, _mul(q, t1, p), p)
+
+        # With n-k odd the loop can stop on a pair that doesn't solve the key
+        # equation for any correctable word, omega has to stay below sigma.
+        # Berlekamp-Massey rejects those words, so must we.
+        if _degree(r1) >= _degree(t1) or _degree(t1) > m // 2:
+            return None, None
+
+        # sigma(z) S'(z) = Omega(z) mod z^m, scale so that sigma(0) = 1. If
+        # sigma(0) is 0 the word can't be decoded, leave it for the root
+        # search to come up empty.
+        if t1[0]:
+            inv = pow(t1[0], p-2, p)
+            t1 = [x * inv % p for x in t1]
+            r1 = [x * inv % p for x in r1]
+
+        # Our omega is the evaluator of (1 + S(z)) sigma(z) = sigma + z Omega
+        omega = _add(t1, [0] + r1, p)
+
+        return _poly(coder, t1), _poly(coder, omega)
+
+def _poly(coder, c):
+    return Polynomial(coder.PFint(x) for x in reversed(c))
+
+def _trim(a):
+    while len(a) > 1 and a[-1] == 0:
+        a.pop()
+    return a
+
+def _degree(a):
+    "Degree of a trimmed list, -1 for the zero polynomial"
+    if len(a) == 1 and a[0] == 0:
+        return -1
+    return len(a) - 1
+
+def _add(a, b, p):
+    if len(a) < len(b):
+        a, b = b, a
+    c = list(a)
+    for i, x in enumerate(b):
+        c[i] = (c[i] + x) % p
+    return _trim(c)
+
+def _sub(a, b, p):
+    return _add(a, [-x % p for x in b], p)
+
+def _mul(a, b, p):
+    c = [0] * (len(a) + len(b) - 1)
+    for i, x in enumerate(a):
+        if x == 0:
+            continue
+        for j, y in enumerate(b):
+            c[i+j] += x * y
+    return _trim([x % p for x in c])
+
+def _divmod(a, b, p):
+    a = list(a)
+    db = _degree(b)
+    inv = pow(b[db], p-2, p)
+    q = [0] * max(len(a) - db, 1)
+    for i in xrange(len(a) - 1 - db, -1, -1):
+        c = a[i+db] * inv % p
+        q[i] = c
+        if c:
+            for j in xrange(db+1):
+                a[i+j] = (a[i+j] - c * b[j]) % p
+    return _trim(q), _trim(a[:db] or [0])
+
+backends = {
+    BerlekampMassey.name: BerlekampMassey,
+    Euclidean.name: Euclidean,
+}
+
+def get_backend(backend):
+    """Returns a DecoderBackend given either an instance or the name of one
+    of the registered backends"""
+    if isinstance(backend, DecoderBackend):
+        return backend
+    try:
+        return backends[backend]()
+    except KeyError:
+        raise ValueError("Unknown decoder backend %r, choose one of %s" %
+                (backend, ', '.join(sorted(backends))))
+
+# vim: sw=4 ts=4 et ai si bg=dark
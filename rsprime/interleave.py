@@ -0,0 +1,76 @@
+# encoding: UTF-8
+# Copyright (c) 2014 Ryan Castellucci <code@ryanc.org>
+# See LICENSE.txt for license terms
+
+"""Interleaving for burst errors.
+
+InterleavedCoder spreads D codewords of an RSCoder over one string, symbol i
+belonging to codeword i % D. A burst of damage to consecutive symbols then
+lands on every codeword in turn, so a burst of up to D*t symbols leaves at
+most t errors in each codeword and is corrected, where 2t = n-k.
+
+The message symbols of all D codewords come first and their parity symbols
+after, so an interleaved codeword starts with its message like a plain one.
+
+Striping and de-interleaving are extended slices (data[c::D]) and extended
+slice assignment into a bytearray, which copy in C without a Python object
+per symbol.
+"""
+
+class InterleavedCoder(object):
+    def __init__(self, coder, depth, workers=1):
+        """Interleaves depth codewords of coder, an RSCoder. Messages are up
+        to depth*k symbols and codewords depth*n. workers is passed to
+        encode_many() and decode_many()."""
+        if depth < 1:
+            raise ValueError("depth must be at least 1")
+        self.coder = coder
+        self.depth = depth
+        self.workers = workers
+        self.n = depth * coder.n
+        self.k = depth * coder.k
+
+    def _columns(self, data, length, what):
+        "Pads data to length and splits it into depth columns"
+        data = self.coder.mapper.pad(data, length)
+        if len(data) > length:
+            raise ValueError("%s length is max %d. %s was %d" % (what, length,
+                what, len(data)))
+        return [data[c::self.depth] for c in xrange(self.depth)]
+
+    def _join(self, columns, length):
+        "Interleaves columns of equal length back into one string"
+        out = bytearray(length)
+        for c, column in enumerate(columns):
+            out[c::self.depth] = column
+        return str(out)
+
+    def encode(self, message):
+        """Encodes a message of up to depth*k symbols, padded at the front
+        like RSCoder.encode. Always returns depth*n symbols."""
+        columns = self._columns(message, self.k, "Message")
+        codes = self.coder.encode_many(columns, self.workers, nostrip=True)
+        return self._join(codes, self.n)
+
+    def verify(self, code):
+        "True if every interleaved codeword is valid"
+        return all(self.coder.verify(column)
+                for column in self._columns(code, self.n, "Codeword"))
+
+    def decode(self, code, nostrip=False):
+        """Decodes an interleaved codeword, correcting up to t errors in each
+        of the depth codewords, so any burst of up to depth*t symbols.
+        Leading zero symbols of the message are stripped unless nostrip is
+        given. Raises DecodeError if any codeword can't be corrected."""
+        columns = self._columns(code, self.n, "Codeword")
+        messages = self.coder.decode_many(columns, self.workers, nostrip=True)
+        message = self._join(messages, self.k)
+        if nostrip:
+            return message
+        return self.coder.mapper.strip(message)
+
+    def __repr__(self):
+        return "%s(%r, depth=%d)" % (self.__class__.__name__, self.coder,
+                self.depth)
+
+# vim: sw=4 ts=4 et ai si bg=dark
@@ -0,0 +1,188 @@
+# encoding: UTF-8
+# Copyright (c) 2014 Ryan Castellucci <code@ryanc.org>
+# See LICENSE.txt for license terms
+
+import argparse
+import random
+import sys
+from timeit import default_timer as timer
+
+from rscoder import RSCoder
+
+"""Error injection load generator for RSCoder.decode.
+
+Encodes random messages for a given (b, n, k), corrupts each codeword with a
+seeded random pattern of errors and erasures, decodes it and records how long
+that took and how it went. Every trial ends in one of three outcomes:
+
+    ok            the original message came back
+    detected      decode raised, the failure was noticed
+    miscorrected  decode returned some other message without complaint
+
+Errors replace a symbol with a different random symbol. The decoder has no
+notion of erasures, so an erasure blanks the symbol to the zero symbol, which
+the decoder then has to find like any other error. Positions are drawn
+uniformly, or as a single contiguous burst when burst is set.
+
+Run it as `python rsprime loadgen --help`.
+"""
+
+_coders = {}
+
+def _coder(b, n, k):
+    try:
+        return _coders[b, n, k]
+    except KeyError:
+        return _coders.setdefault((b, n, k), RSCoder(b, n, k))
+
+def corrupt(symbols, b, errors, erasures=0, burst=False, rnd=random):
+    """Returns a copy of the list symbols with errors random symbol errors
+    and erasures zeroed symbols, drawn from rnd"""
+    r = list(symbols)
+    count = min(errors + erasures, len(r))
+    if burst:
+        start = rnd.randint(0, len(r) - count)
+        positions = range(start, start + count)
+        rnd.shuffle(positions)
+    else:
+        positions = rnd.sample(xrange(len(r)), count)
+
+    for i, pos in enumerate(positions):
+        if i < errors:
+            r[pos] = (r[pos] + rnd.randint(1, b-1)) % b
+        else:
+            r[pos] = 0
+    return r
+
+def _trials(task):
+    """Runs one batch of trials for a single error count, returns a list of
+    (latency, outcome) tuples. Module level so it can be sent to a pool."""
+    b, n, k, errors, erasures, burst, trials, seed = task
+    coder = _coder(b, n, k)
+    mapper = coder.mapper
+    rnd = random.Random(seed)
+
+    results = []
+    for _ in xrange(trials):
+        message = mapper.encode([rnd.randrange(b) for _ in xrange(k)])
+        code = coder.encode(message, nostrip=True)
+        r = mapper.encode(corrupt(mapper.decode(code), b, errors, erasures,
+            burst, rnd))
+
+        start = timer()
+        try:
+            decoded = coder.decode(r, nostrip=True)
+        except Exception:
+            outcome = 'detected'
+        else:
+            outcome = 'ok' if decoded == message else 'miscorrected'
+        results.append((timer() - start, outcome))
+    return results
+
+def _percentile(values, q):
+    "Nearest rank percentile of a sorted list"
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def run(b, n, k, error_counts=None, trials=100, erasures=0, burst=False,
+        seed=0, workers=1):
+    """Runs trials decodes for each number of errors in error_counts, by
+    default 0 through two past the correction limit, and returns a report
+    dict. With workers > 1 the batches are spread across a process pool."""
+    if error_counts is None:
+        error_counts = range((n-k)//2 + 3)
+    tasks = [(b, n, k, e, erasures, burst, trials, seed * 1000003 + e)
+            for e in error_counts]
+
+    _coder(b, n, k)
+    start = timer()
+    if workers > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(workers)
+        try:
+            batches = pool.map(_trials, tasks)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        batches = map(_trials, tasks)
+    elapsed = timer() - start
+
+    rows = []
+    for e, batch in zip(error_counts, batches):
+        latencies = sorted(t for t, _ in batch)
+        outcomes = [o for _, o in batch]
+        rows.append({
+            'errors': e,
+            'trials': len(batch),
+            'p50': _percentile(latencies, 0.50),
+            'p90': _percentile(latencies, 0.90),
+            'p99': _percentile(latencies, 0.99),
+            'max': latencies[-1] if latencies else 0.0,
+            'ok': outcomes.count('ok'),
+            'detected': outcomes.count('detected'),
+            'miscorrected': outcomes.count('miscorrected'),
+        })
+
+    total = sum(row['trials'] for row in rows)
+    return {
+        'b': b, 'n': n, 'k': k,
+        'erasures': erasures,
+        'burst': burst,
+        'workers': workers,
+        'elapsed': elapsed,
+        'throughput': total / elapsed if elapsed else 0.0,
+        'rows': rows,
+    }
+
+def format_report(report):
+    lines = ["RS(%(b)d, %(n)d, %(k)d) erasures=%(erasures)d burst=%(burst)s "
+            "workers=%(workers)d" % report,
+            "%d decodes in %.2fs, %.1f decodes/s" % (
+                sum(r['trials'] for r in report['rows']), report['elapsed'],
+                report['throughput']),
+            "%6s %7s %9s %9s %9s %9s %7s %9s %9s" % ('errors', 'trials',
+                'p50 ms', 'p90 ms', 'p99 ms', 'max ms', 'ok', 'detected',
+                'miscorr')]
+    for row in report['rows']:
+        trials = float(row['trials']) or 1.0
+        lines.append("%6d %7d %9.3f %9.3f %9.3f %9.3f %6.1f%% %8.1f%% %8.1f%%" % (
+            row['errors'], row['trials'], row['p50'] * 1e3, row['p90'] * 1e3,
+            row['p99'] * 1e3, row['max'] * 1e3, 100 * row['ok'] / trials,
+            100 * row['detected'] / trials, 100 * row['miscorrected'] / trials))
+    return "\n".join(lines)
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='rsprime loadgen',
+            description="Decode latency and correctness under injected errors")
+    parser.add_argument('-b', type=int, default=59, help="field order")
+    parser.add_argument('-n', type=int, default=58, help="codeword length")
+    parser.add_argument('-k', type=int, default=46, help="message length")
+    parser.add_argument('--trials', type=int, default=100,
+            help="decodes per error count")
+    parser.add_argument('--min-errors', type=int, default=0)
+    parser.add_argument('--max-errors', type=int, default=None,
+            help="default is two past the correction limit")
+    parser.add_argument('--erasures', type=int, default=0,
+            help="zeroed symbols added to every trial")
+    parser.add_argument('--burst', action='store_true',
+            help="corrupt one contiguous run of symbols")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=1,
+            help="worker processes")
+    args = parser.parse_args(argv)
+
+    max_errors = args.max_errors
+    if max_errors is None:
+        max_errors = (args.n - args.k)//2 + 2
+    report = run(args.b, args.n, args.k,
+            range(args.min_errors, max_errors + 1), args.trials,
+            args.erasures, args.burst, args.seed, args.workers)
+    print format_report(report)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
+
+# vim: sw=4 ts=4 et ai si bg=dark
@@ -0,0 +1,92 @@
+# encoding: UTF-8
+# Copyright (c) 2014 Ryan Castellucci <code@ryanc.org>
+# See LICENSE.txt for license terms
+
+import threading
+
+class LRUCache(object):
+    """A size bounded, thread safe mapping that discards the least recently
+    used entry when full. Keeps count of hits, misses and evictions.
+
+    Entries live in a dict whose values are nodes of a circular doubly linked
+    list, [prev, next, key, value], with self.root as the sentinel. A hit is
+    one dict probe plus relinking the node at the front."""
+
+    def __init__(self, maxsize):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.data = {}
+            self.root = root = []
+            root[:] = [root, root, None, None]
+            self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def get(self, key, default=None):
+        """Returns the value stored for key and marks it most recently used,
+        or default if there is none"""
+        with self.lock:
+            node = self.data.get(key)
+            if node is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            prev, next_ = node[0], node[1]
+            prev[1] = next_
+            next_[0] = prev
+            root = self.root
+            last = root[0]
+            last[1] = root[0] = node
+            node[0] = last
+            node[1] = root
+            return node[3]
+
+    def put(self, key, value):
+        with self.lock:
+            root = self.root
+            node = self.data.get(key)
+            if node is not None:
+                # Unlink, it gets relinked at the front below
+                node[0][1] = node[1]
+                node[1][0] = node[0]
+                node[3] = value
+            else:
+                if len(self.data) >= self.maxsize:
+                    # The node after the sentinel is the oldest one
+                    oldest = root[1]
+                    root[1] = oldest[1]
+                    oldest[1][0] = root
+                    del self.data[oldest[2]]
+                    self.evictions += 1
+                node = [None, None, key, value]
+                self.data[key] = node
+            last = root[0]
+            last[1] = root[0] = node
+            node[0] = last
+            node[1] = root
+
+    def stats(self):
+        "Returns a dict of the hit, miss and eviction counters"
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self.data),
+                'maxsize': self.maxsize,
+            }
+
+    def __repr__(self):
+        return "%s(maxsize=%d)" % (self.__class__.__name__, self.maxsize)
+
+# vim: sw=4 ts=4 et ai si bg=dark
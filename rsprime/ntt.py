@@ -0,0 +1,89 @@
+# encoding: UTF-8
+# Copyright (c) 2014 Ryan Castellucci <code@ryanc.org>
+# See LICENSE.txt for license terms
+
+"""Number theoretic transform over GF(p).
+
+The transform of a_0 ... a_(N-1) with respect to α, a generator of the
+multiplicative group (so N = p-1), is
+
+    A_m = a_0 + a_1 α^m + a_2 α^(2m) + ... + a_(N-1) α^((N-1)m)
+
+that is, the polynomial with coefficients a_i evaluated at every nonzero
+field element. RSCoder uses it to get all syndromes of a codeword, or sigma's
+value at every point for the root search, in one go.
+
+This is a mixed radix Cooley-Tukey transform, it costs O(N * sum of the prime
+factors of N). That only beats evaluating point by point when p-1 is smooth,
+for example p = 65537 where N = 2^16.
+"""
+
+def factorize(n):
+    "Returns the prime factors of n in ascending order"
+    factors = []
+    f = 2
+    while f * f <= n:
+        while n % f == 0:
+            factors.append(f)
+            n //= f
+        f += 1
+    if n > 1:
+        factors.append(n)
+    return factors
+
+class NTT(object):
+    """Transform of length p-1 over GF(p). exptable[i] must be α^i for
+    0 <= i < p-1, as in RSCoder.exptable."""
+    def __init__(self, p, exptable):
+        self.p = p
+        self.size = p - 1
+        self.exptable = exptable
+        self.factors = factorize(self.size)
+        # Rough number of multiplications per output value, for comparison
+        # with the n-k or deg(sigma)+1 of evaluating point by point. A radix 2
+        # butterfly shares one multiplication between two outputs.
+        self.cost = sum(0.5 if f == 2 else f for f in self.factors)
+        # True or False once RSCoder has checked it against the direct
+        # computation
+        self.checked = None
+
+    def transform(self, values):
+        """Returns the transform of values, a list of at most p-1 ints. It is
+        padded with zeros to p-1 entries."""
+        a = list(values) + [0] * (self.size - len(values))
+        return self._transform(a, 1, 0)
+
+    def _transform(self, a, step, level):
+        """Transform of a with respect to α^step, where len(a) is the product
+        of self.factors[level:]"""
+        length = len(a)
+        if length == 1:
+            return a
+        p = self.p
+        size = self.size
+        w = self.exptable
+        r = self.factors[level]
+        m = length // r
+
+        # Split into r interleaved subsequences, transform each with respect
+        # to α^(step*r), then combine
+        subs = [self._transform(a[s::r], step * r, level + 1) for s in xrange(r)]
+
+        if r == 2:
+            even, odd = subs
+            out = [0] * length
+            for i in xrange(m):
+                t = w[step * i % size] * odd[i]
+                out[i] = (even[i] + t) % p
+                out[i + m] = (even[i] - t) % p
+            return out
+
+        out = []
+        for q in xrange(r):
+            for i in xrange(m):
+                e = step * (i + q * m)
+                out.append(sum(w[e * s % size] * sub[i]
+                    for s, sub in enumerate(subs)) % p)
+        return out
+
+# vim: sw=4 ts=4 et ai si bg=dark
@@ -3,6 +3,7 @@
 # See LICENSE.txt for license terms
 
 import math
+import threading
 # adapted from http://stackoverflow.com/a/18833870
 def is_prime(n):
     if (n < 2) or (n % 2 == 0 and n > 2) or (not isinstance(n, (int, long))):
@@ -11,44 +12,72 @@ def is_prime(n):
 
 class PFint(int):
     "Instances of this object are elements of a prime field of order p."
+    __slots__ = ()
+
     # Maps integers to PFint instances
     cache = {}
     invtable = {}
+    # Maps p to the subclass of PFint for the field of order p
+    fields = {}
+    # Held while a new field is being set up
+    lock = threading.Lock()
 
     def __new__(cls, p, n=None):
-        if not is_prime(p):
-            raise ValueError("Specified field order is not a prime number.")
         """
-        if a value wasn't specified for 'n', return a subclass of PFint for a
-        field of order p
+        if a value wasn't specified for 'n', return the subclass of PFint for
+        a field of order p. There is exactly one such subclass per prime, it
+        is created on first use and carries p as a class attribute.
         """
         if n is None:
-            name  = 'PF%dint' % p
-            bases = (PFint,)
-            attrs = {'__new__': lambda cls, n: PFint(p, n)}
-            return type(name, bases, attrs)
+            try:
+                return PFint.fields[p]
+            except KeyError:
+                return PFint._new_field(p)
 
-        # Check cache
-        # Caching sacrifices a bit of speed for less memory usage. This way,
-        # the maximum number of instances of this class at any time is limited.
+        # Every element of a field is created along with its class, so this
+        # only ever reads the cache and is safe to call from any thread.
         try:
             return PFint.cache[p][n]
         except KeyError:
-            if n >= p or n < 0:
-                raise ValueError("Field elements of PF(%d) are between 0 and %d Cannot be %s" % (p, p-1, n))
-
-        newval = int.__new__(cls, n)
-        newval.__class__ = PFint(p)
-        newval.p = p
-        if p not in PFint.cache:
-            PFint.cache[p] = {}    
-            # multiplicitive inverse table, modulo b
-            PFint.invtable[p] = map(lambda x: pow(x, p-2, p), range(0, p))
-            # zero doesn't have a multiplicitive inverse
-            PFint.invtable[p][0] = None
-
-        PFint.cache[p][n] = newval
-        return newval
+            pass
+        if p not in PFint.fields:
+            PFint._new_field(p)
+            return PFint(p, n)
+        raise ValueError("Field elements of PF(%d) are between 0 and %d Cannot be %s" % (p, p-1, n))
+
+    @staticmethod
+    def _new_field(p):
+        """Creates the subclass for the field of order p along with all of its
+        elements and its inverse table. Nothing is written to the class level
+        tables after this."""
+        with PFint.lock:
+            if p in PFint.fields:
+                return PFint.fields[p]
+            if not is_prime(p):
+                raise ValueError("Specified field order is not a prime number.")
+            name  = 'PF%dint' % p
+            bases = (PFint,)
+            attrs = {
+                '__slots__': (),
+                '__new__': lambda cls, n: PFint(p, n),
+                'p': p,
+            }
+            field = type(name, bases, attrs)
+
+            # Caching sacrifices a bit of speed for less memory usage. This
+            # way, the maximum number of instances of this class at any time
+            # is limited.
+            PFint.cache[p] = dict((n, int.__new__(field, n)) for n in xrange(p))
+            if p not in PFint.invtable:
+                # multiplicitive inverse table, modulo b
+                PFint.invtable[p] = map(lambda x: pow(x, p-2, p), range(0, p))
+                # zero doesn't have a multiplicitive inverse
+                PFint.invtable[p][0] = None
+
+            # Publish the class last, other threads skip the lock once it's
+            # there
+            PFint.fields[p] = field
+            return field
 
     def __add__(self, other):
         if isinstance(other, PFint):
@@ -101,6 +130,8 @@ class PFint(int):
         return PFint(self.p, pow(int(self), power, self.p))
 
     def inverse(self):
+        if not self:
+            raise ZeroDivisionError("0 has no multiplicative inverse")
         return PFint(self.p, PFint.invtable[self.p][self])
 
     def __div__(self, other):
@@ -74,6 +74,8 @@ class Polynomial(object):
         return len(self.coefficients) - 1
 
     def __add__(self, other):
+        if isinstance(other, SparsePolynomial):
+            return other + self
         diff = len(self) - len(other)
         if diff > 0:
             t1 = self.coefficients
@@ -90,6 +92,8 @@ class Polynomial(object):
         return self + -other
             
     def __mul__(self, other):
+        if isinstance(other, SparsePolynomial):
+            return other * self
         terms = [0] * (len(self) + len(other))
 
         for i1, c1 in enumerate(reversed(self.coefficients)):
@@ -198,3 +202,139 @@ class Polynomial(object):
             return 0
         else:
             return self.coefficients[-(degree+1)]
+
+class SparsePolynomial(object):
+    """A polynomial stored as a dict, terms, mapping each power that has a
+    nonzero coefficient to that coefficient. Immutable like Polynomial.
+
+    For polynomials with few terms and a high degree, like x^(n-k) or an
+    error polynomial with one term per error, shifting, evaluating and
+    adding to or subtracting from a Polynomial cost O(number of terms)
+    instead of O(degree). Mixed with a Polynomial, sums, differences and
+    products are Polynomials, anything else is kept sparse.
+
+    >>> print SparsePolynomial({64: 8, 32: 5})
+    8x^64 + 5x^32
+
+    >>> print SparsePolynomial(x3=1) + Polynomial((2, 0, 1))
+    x^3 + 2x^2 + 1
+    """
+    def __init__(self, terms=None, **sparse):
+        if terms and sparse:
+            raise TypeError("Specify a terms dict /or/ keyword terms, not both")
+        if sparse:
+            terms = dict((int(power[1:]), c) for power, c in sparse.iteritems())
+        self.terms = dict((e, c) for e, c in (terms or {}).iteritems() if c != 0)
+
+    def _zero(self):
+        "0 of the same type as the coefficients"
+        for c in self.terms.itervalues():
+            return c.__class__(0)
+        return 0
+
+    def __len__(self):
+        """Returns the number of coefficients of the dense form, like
+        Polynomial"""
+        return self.degree() + 1
+    def degree(self):
+        return max(self.terms) if self.terms else 0
+
+    @property
+    def coefficients(self):
+        "The coefficients in order of decreasing power, as in Polynomial"
+        l = self.degree()
+        c = [self._zero()] * (l + 1)
+        for e, x in self.terms.iteritems():
+            c[l - e] = x
+        return tuple(c)
+
+    def dense(self):
+        "Returns this polynomial as a Polynomial"
+        return Polynomial(self.coefficients)
+
+    def shift(self, n):
+        "Returns this polynomial times x^n"
+        return self.__class__(dict((e + n, c) for e, c in self.terms.iteritems()))
+
+    def __add__(self, other):
+        if isinstance(other, SparsePolynomial):
+            terms = dict(self.terms)
+            for e, c in other.terms.iteritems():
+                terms[e] = terms[e] + c if e in terms else c
+            return self.__class__(terms)
+
+        # Copy the dense coefficients and only touch the ones we have terms for
+        c = list(other.coefficients)
+        if self.degree() >= len(c):
+            c[:0] = [self._zero()] * (self.degree() + 1 - len(c))
+        l = len(c) - 1
+        for e, x in self.terms.iteritems():
+            c[l - e] = c[l - e] + x
+        return other.__class__(c)
+    __radd__ = __add__
+
+    def __neg__(self):
+        return self.__class__(dict((e, -c) for e, c in self.terms.iteritems()))
+    def __sub__(self, other):
+        return self + -other
+    def __rsub__(self, other):
+        return -self + other
+
+    def __mul__(self, other):
+        if isinstance(other, SparsePolynomial):
+            terms = {}
+            for e1, c1 in self.terms.iteritems():
+                for e2, c2 in other.terms.iteritems():
+                    e = e1 + e2
+                    terms[e] = terms[e] + c1 * c2 if e in terms else c1 * c2
+            return self.__class__(terms)
+
+        coefficients = other.coefficients
+        if len(self.terms) == 1:
+            (e, x), = self.terms.items()
+            if x == 1:
+                # A shift only appends zeros
+                return other.__class__(coefficients + (self._zero(),) * e)
+        c = [self._zero()] * (len(coefficients) + self.degree())
+        l = len(c) - 1
+        for e, x in self.terms.iteritems():
+            for i, y in enumerate(reversed(coefficients)):
+                c[l - e - i] = c[l - e - i] + x * y
+        return other.__class__(c)
+    __rmul__ = __mul__
+
+    def __eq__(self, other):
+        return self.coefficients == other.coefficients
+    def __ne__(self, other):
+        return self.coefficients != other.coefficients
+    def __hash__(self):
+        return hash(self.coefficients)
+
+    def __repr__(self):
+        return "%s(%r)" % (self.__class__.__name__, self.terms)
+    def __str__(self):
+        if not self.terms:
+            return "0"
+        out = []
+        for e in sorted(self.terms, reverse=True):
+            c = self.terms[e]
+            if c == 1 and e != 0:
+                c = ""
+            if e > 1:
+                out.append("%sx^%s" % (c, e))
+            elif e == 1:
+                out.append("%sx" % c)
+            else:
+                out.append("%s" % c)
+        return " + ".join(out)
+
+    def evaluate(self, x):
+        "Evaluate this polynomial at value x, returning the result."
+        c = x.__class__(0)
+        for e, t in self.terms.iteritems():
+            c = c + t * x ** e
+        return c
+
+    def get_coefficient(self, degree):
+        """Returns the coefficient of the specified term"""
+        return self.terms.get(degree, 0)
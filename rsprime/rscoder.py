@@ -3,9 +3,32 @@
 # Copyright (c) 2014 Ryan Castellucci <code@ryanc.org>
 # See LICENSE.txt for license terms
 
-from polynomial import Polynomial
+import random
+import threading
+from array import array
+
+from polynomial import Polynomial, SparsePolynomial
 from mapper import Mapper
 from pfint import PFint
+from tables import dump_tables, load_tables
+from decoders import get_backend
+from lru import LRUCache
+from syndromestate import SyndromeState
+import scanner
+from ntt import NTT
+from swar import SWAR
+from autotune import KERNELS, tune
+import codegen
+
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    ThreadPoolExecutor = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 """This module implements Reed-Solomon Encoding.
 It supports arbitrary configurations for n and k, the codeword length and
@@ -32,6 +55,11 @@ than 16 errors per block, your data will be recovered.
 mapper_default_alphabet = '0123456789abcdefghijkmnopqrstuvwxyzABCDEFGHJKLMNPQRSTUVWXYZ'
 mapper_default_equivs   = [('O', '0'), ('I', '1'), ('l', '1')]
 
+class DecodeError(ValueError):
+    """Raised by decode when the word has more errors than the code can
+    correct"""
+    pass
+
 def findgen(x):
     for g in range(x):
         # How many unique values do we get with this g?
@@ -41,7 +69,9 @@ def findgen(x):
             return g
 
 class RSCoder(object):
-    def __init__(self, b, n, k, mapper=None):
+    def __init__(self, b, n, k, mapper=None, tables=None,
+            decoder='berlekamp-massey', cache_size=0, engine='poly',
+            profile=None, erasure_cache_size=128):
         """Creates a new Reed-Solomon Encoder/Decoder object configured with
         the given b, n and k values.
         b is the base to use, must be prime
@@ -49,6 +79,23 @@ class RSCoder(object):
         k is the length of the message, must be less than n
         mapper is an class with encode and decode methods used to translate
         between strings and arrays of integers
+        tables, if given, is a CoderTables object as returned by load_tables
+        holding the precomputed tables for this b, n and k
+        decoder is the key equation solver used by decode, either the name
+        of a backend in decoders.backends or a DecoderBackend instance
+        cache_size, if nonzero, enables an LRU cache of that many verify and
+        decode results, see the cache attribute for its counters
+        engine selects how encode and the syndromes are computed: 'poly' with
+        Polynomial objects and loops over ints, 'swar' with many symbols
+        packed into each big int (see swar.py), for small b, 'codegen' to
+        encode with a function compiled for this code (see codegen.py), or
+        'auto' to time every way there is and use the fastest (see
+        autotune.py). The kernels attribute shows what was picked.
+        profile is the path of a JSON file keeping the timings of 'auto', so
+        only the first coder with the same b, n and k has to run them. The
+        profile attribute holds the timings.
+        erasure_cache_size is how many erasure patterns recover() keeps the
+        interpolation weights of
 
         The code will have error correcting power s where 2s = n - k
 
@@ -61,6 +108,9 @@ class RSCoder(object):
             raise ValueError("n must be less than b")
         if not k < n:
             raise ValueError("Codeword length n must be greater than message length k")
+        if tables is not None and (tables.b, tables.n, tables.k) != (b, n, k):
+            raise ValueError("Tables are for (%d, %d, %d), not (%d, %d, %d)" %
+                    (tables.b, tables.n, tables.k, b, n, k))
 
         if mapper is None:
             if b <= len(mapper_default_alphabet):
@@ -70,18 +120,193 @@ class RSCoder(object):
         else:
             self.mapper = mapper
 
+        self.decoder = get_backend(decoder)
+
+        if engine not in ('poly', 'swar', 'codegen', 'auto'):
+            raise ValueError("Unknown engine %r, choose 'poly', 'swar', "
+                    "'codegen' or 'auto'" % (engine,))
+        self.engine = engine
+
+        # Results are keyed on the symbol values, so strings that only differ
+        # by equivalent characters share an entry
+        self.cache = LRUCache(cache_size) if cache_size else None
+        self.erasure_cache = LRUCache(erasure_cache_size)
+
+        # Held while filling in what is computed on first use, see _transform
+        # and h
+        self._lock = threading.Lock()
+
+        if tables is not None and b not in PFint.invtable:
+            # Share the mapped inverse table instead of building our own
+            PFint.invtable[b] = tables.invtable
+
         # α (a) is the generator of the field being used. This must be picked
         # appropriately if the field is changed. For integers mod p a generator
         # is a number such that for every n in ints mod p, There exists and l
         # Such that α^l=n mod p
         # For p=59 α=2 works (this can be verified easily through brute force
         self.PFint = PFint(b)
-        self.a = self.PFint(findgen(b))
+        if tables is None:
+            self.a = self.PFint(findgen(b))
+        else:
+            self.a = self.PFint(tables.a)
 
         self.b = b
         self.n = n
         self.k = k
 
+        if tables is not None:
+            self.g = Polynomial(self.PFint(x) for x in tables.g)
+            self._h = Polynomial(self.PFint(x) for x in tables.h)
+            self.exptable = tables.exptable
+        else:
+            self._build_tables()
+
+        # Single error correction. A lone error of magnitude e at the
+        # coefficient of x^j gives syndromes S_l = e*α^(l*j), so every ratio
+        # S_(l+1)/S_l is α^j. This maps α^j to j and α^-j for each of the n
+        # positions, see _single_error.
+        self.single_errors = {}
+        for j in xrange(n):
+            self.single_errors[self.exptable[j]] = (j, self.exptable[-j % (b-1)])
+
+        # g(x) = x^(n-k) + g_1 x^(n-k-1) + ... + g_(n-k), the parity register
+        # in _parity feeds back -g_1 ... -g_(n-k)
+        self.generator_taps = tuple(-int(x) % b for x in self.g.coefficients[1:])
+
+        # The points the syndromes are evaluated at, α^1 through α^(n-k)
+        self.syndrome_points = tuple(self.exptable[l % (b-1)]
+                for l in xrange(1, n-k+1))
+
+        # The kernels for encode, the syndromes and the root search, see
+        # autotune.py for the choices. The engine picks them, or with 'auto'
+        # they are timed against each other.
+        self.kernels = {'encode': 'int', 'syndromes': 'direct', 'roots': 'direct'}
+        self.swar = None
+        self.ntt = None
+        self.numpy_syndromes = None
+        self.codegen_parity = None
+        self.profile = None
+        if engine == 'auto':
+            self.profile = tune(self, profile)
+        else:
+            self._use_kernels(self._engine_kernels(engine))
+
+        # Every table above is built here and never written to afterwards, and
+        # PFint(b) created all field elements up front, so encode, verify and
+        # decode only read shared state. One coder can serve many threads.
+        # The exceptions, the check of the NTT and h, are done once, under
+        # self._lock, and the caches have locks of their own.
+
+    def _engine_kernels(self, engine):
+        "The kernels the 'poly', 'swar' and 'codegen' engines use"
+        b, n, k = self.b, self.n, self.k
+        if engine == 'swar':
+            return {'encode': 'swar', 'syndromes': 'swar', 'roots': 'direct'}
+
+        # When b-1 is smooth, a number theoretic transform evaluates at every
+        # nonzero point for less than evaluating at the points we need one by
+        # one. Use it for the syndromes if that is the case, and keep it for
+        # root searches on locators of high enough degree, see _chien_search.
+        # It is checked against the direct computation the first time it is
+        # used, see _transform.
+        kernels = {'encode': engine, 'syndromes': 'direct', 'roots': 'direct'}
+        plan = NTT(b, self.exptable)
+        if plan.size * plan.cost < n * (n-k) or plan.cost < (n-k) // 2 + 1:
+            kernels['roots'] = 'ntt'
+            if plan.size * plan.cost < n * (n-k):
+                kernels['syndromes'] = 'ntt'
+        return kernels
+
+    def _checked_ntt(self, plan=None):
+        """Returns plan, by default a new NTT for this field, if it agrees
+        with the direct syndromes on a random word, else None. Records the
+        outcome in plan.checked."""
+        plan = plan or NTT(self.b, self.exptable)
+        rnd = random.Random(self.b)
+        word = [rnd.randrange(self.b) for _ in xrange(self.n)]
+        plan.checked = (self._syndrome_list_ntt(word, plan) ==
+                self._syndrome_list_direct(word))
+        return plan if plan.checked else None
+
+    def _transform(self):
+        """Returns the coder's NTT, or None if it disagrees with the direct
+        computation, in which case the coder goes back to the direct
+        kernels. The check is a full transform, as slow as building the
+        other tables for large b, so it waits for the first use instead of
+        slowing down every coder, or every load of a table file. Threads
+        that get here first wait for the one doing the check."""
+        plan = self.ntt
+        if plan is not None and plan.checked is None:
+            with self._lock:
+                if plan.checked is None and self._checked_ntt(plan) is None:
+                    self.kernels = dict(self.kernels, syndromes='direct',
+                            roots='direct')
+                    self.ntt_syndromes = False
+        if plan is None or not plan.checked:
+            return None
+        return plan
+
+    def _prepare_kernel(self, op, name):
+        """Builds what the kernel name for op needs, raises ValueError if it
+        can't be used for this code"""
+        b, n, k = self.b, self.n, self.k
+        if name not in KERNELS.get(op, ()):
+            raise ValueError("Unknown %s kernel %r" % (op, name))
+        if name == 'swar' and self.swar is None:
+            # Packed matrices, which give all syndromes of a codeword, or all
+            # parity symbols of a message, with one big multiplication. The
+            # parity is linear in the message, so its matrix holds the parity
+            # of each unit message.
+            swar = SWAR(b, 2 * n)
+            self.swar_syndromes = swar.matrix([
+                [self.exptable[l * (n-1-i) % (b-1)] for i in xrange(n)]
+                for l in xrange(1, n-k+1)])
+            units = [self._parity_direct([1] + [0] * (k-1-i)) for i in xrange(k)]
+            self.swar_parity = swar.matrix(map(list, zip(*units)))
+            self.swar = swar
+        elif name == 'ntt' and self.ntt is None:
+            # Checked on first use, see _transform
+            self.ntt = NTT(b, self.exptable)
+        elif name == 'codegen' and self.codegen_parity is None:
+            func = codegen.parity_function(b, self.generator_taps)
+            if not codegen.check(func, self._parity_direct, b, k):
+                raise ValueError("Generated parity function disagrees with "
+                        "the division register")
+            self.codegen_parity = func
+        elif name == 'numpy' and self.numpy_syndromes is None:
+            if numpy is None:
+                raise ValueError("numpy is not installed")
+            if n * (b-1) ** 2 >= 1 << 63:
+                raise ValueError("b = %d is too large for 64 bit sums" % b)
+            self.numpy_syndromes = numpy.array([
+                [self.exptable[l * (n-1-i) % (b-1)] for i in xrange(n)]
+                for l in xrange(1, n-k+1)], dtype=numpy.int64)
+
+    def _use_kernels(self, kernels):
+        """Switches to the given dict of kernels, one per operation, and
+        drops whatever only other kernels needed"""
+        for op in KERNELS:
+            self._prepare_kernel(op, kernels.get(op))
+        self.kernels = dict((op, kernels[op]) for op in KERNELS)
+        used = set(self.kernels.values())
+        if 'swar' not in used:
+            self.swar = None
+        if 'ntt' not in used:
+            self.ntt = None
+        if 'numpy' not in used:
+            self.numpy_syndromes = None
+        if 'codegen' not in used:
+            self.codegen_parity = None
+        self.ntt_syndromes = self.kernels['syndromes'] == 'ntt'
+
+    def _build_tables(self):
+        """Computes the generator polynomials and the α-power and log tables
+        from scratch"""
+        b = self.b
+        n = self.n
+        k = self.k
+
         # Generate the generator polynomial for RS codes
         # g(x) = (x-α^1)(x-α^2)...(x-α^(n-k))
         
@@ -93,18 +318,49 @@ class RSCoder(object):
 
         self.g = g
 
-        # h(x) = (x-α^(n-k+1))...(x-α^n)
-        h = Polynomial((self.PFint(1),))
-        for l in xrange(n-k+1,n+1):
-            p = Polynomial((self.PFint(1), self.PFint(self.a)**l))
-            h = h * p
-        self.h = h
+        # h is multiplied out on first use, see the h property
+        self._h = None
 
         # g*h is used in verification, and is always x^n-1
         # TODO: This is hardcoded for (255,223)
         # But it doesn't matter since my verify method doesn't use it
         #self.gtimesh = Polynomial(x_max=self.PFint(1), x_zero=self.PFint(1))
 
+        # exptable[i] is α^i
+        exptable = [1] * (b-1)
+        for i in xrange(1, b-1):
+            exptable[i] = exptable[i-1] * int(self.a) % b
+        self.exptable = tuple(exptable)
+
+    @property
+    def h(self):
+        """h(x) = (x-α^(n-k+1))...(x-α^n)
+
+        Nothing in encoding or decoding uses h, and multiplying out its k
+        factors takes O(k^2), far longer than everything else __init__ does
+        for large k. So it is only computed when first asked for."""
+        with self._lock:
+            if self._h is None:
+                h = Polynomial((self.PFint(1),))
+                for l in xrange(self.n-self.k+1,self.n+1):
+                    p = Polynomial((self.PFint(1), self.PFint(self.a)**l))
+                    h = h * p
+                self._h = h
+        return self._h
+
+    @classmethod
+    def from_tables(cls, path, mapper=None):
+        """Creates an RSCoder from a table file written by save_tables(). The
+        file is mapped read-only, so processes loading the same file share
+        its pages."""
+        tables = load_tables(path)
+        return cls(tables.b, tables.n, tables.k, mapper, tables=tables)
+
+    def save_tables(self, path):
+        """Writes the precomputed tables of this coder to path, see
+        from_tables()"""
+        dump_tables(self, path)
+
     def encode(self, message, poly=False, nostrip=False):
         """Encode a given string with reed-solomon encoding. Returns a byte
         string with the k message bytes and n-k parity bytes at the end.
@@ -125,11 +381,21 @@ class RSCoder(object):
             raise ValueError("Message length is max %d. Message was %d" % (k,
                 len(message)))
 
+        if self.kernels['encode'] != 'poly' and not poly:
+            symbols = self._symbols(message)
+            if min(symbols) < 0:
+                raise ValueError("Message contains characters outside the alphabet")
+            ret = self.mapper.encode(symbols + self._parity(symbols))
+            if nostrip:
+                return ret
+            # Same as the Polynomial path, which drops leading zeros
+            return self.mapper.strip(ret) or self.mapper.encode(0)
+
         # Encode message as a polynomial:
         m = Polynomial(self.PFint(x) for x in self.mapper.decode(message))
 
         # Shift polynomial up by n-k by multiplying by x^(n-k)
-        mprime = m * Polynomial((self.PFint(1),) + (self.PFint(0),)*(n-k))
+        mprime = m * SparsePolynomial({n-k: self.PFint(1)})
 
         # mprime = q*g + b for some q
         # so let's find b:
@@ -150,14 +416,48 @@ class RSCoder(object):
         else:
             return ret
 
+    def _symbol_table(self):
+        """Returns a dict mapping every single byte character that stands
+        for a symbol of this code to its value. Built by asking mapper.decode
+        about each byte, the only thing a mapper has to provide."""
+        table = {}
+        for ch in map(chr, xrange(256)):
+            try:
+                value = self.mapper.decode(ch)
+            except (ValueError, KeyError, IndexError, TypeError):
+                continue
+            if isinstance(value, (int, long)) and 0 <= value < self.b:
+                table[ch] = value
+        return table
+
+    def _symbols(self, code):
+        "Maps a string to a list of symbol values"
+        symbols = self.mapper.decode(code)
+        if isinstance(symbols, int):
+            return [symbols]
+        return symbols
+
+    def _cache_key(self, op, code):
+        return (op,) + tuple(self._symbols(code))
+
     def verify(self, code):
         """Verifies the code is valid by testing that the code as a polynomial
         code divides g
         returns True/False
         """
+        if self.cache is None:
+            return self._verify(code)
+
+        key = self._cache_key('verify', code)
+        valid = self.cache.get(key)
+        if valid is None:
+            valid = self._verify(code)
+            self.cache.put(key, valid)
+        return valid
+
+    def _verify(self, code):
         n = self.n
         k = self.k
-        h = self.h
         g = self.g
 
         c = Polynomial(self.PFint(x) for x in self.mapper.decode(code))
@@ -179,63 +479,440 @@ class RSCoder(object):
         stripped, but that can cause problems if decoding binary data. When
         nostrip is True, messages returned are always k bytes long. This is
         useful to make sure no data is lost when decoding binary data.
+
+        If the coder has a cache, messages are returned with equivalent
+        characters replaced by their canonical form.
+
+        Raises DecodeError as soon as the decoder can tell that r has more
+        errors than it can correct. Words with that many errors can also be
+        miscorrected, to some other codeword, without any error being raised.
         """
+        if self.cache is None:
+            return self._decode(r, nostrip)
+
+        key = self._cache_key('decode', r)
+        message = self.cache.get(key)
+        if message is None:
+            message = self._decode(r, nostrip=True)
+            if message:
+                # Equivalent characters in their canonical form. The mapper
+                # can't take an empty string, the message of a code like '0'.
+                message = self.mapper.encode(self.mapper.decode(message))
+            self.cache.put(key, message)
+        if nostrip:
+            return message
+        return self.mapper.strip(message)
 
+    def _decode(self, r, nostrip=False):
         n = self.n
         k = self.k
         
-        tek = Polynomial(self.PFint(x) for x in self.mapper.decode(r))
-        
-        if self.verify(r):
-            # The last n-k bytes are parity
+        symbols = self._symbols(r)
+        # The kernels work on ints, they would take the -1 of a character
+        # outside the alphabet for b-1
+        if symbols and not 0 <= min(symbols) <= max(symbols) < self.b:
+            raise ValueError("Codeword contains characters outside the alphabet")
+        if len(symbols) <= n:
+            syn = self._syndrome_list(symbols)
+            if not any(syn):
+                # The last n-k bytes are parity
+                if nostrip:
+                    return r[:-(n-k)]
+                else:
+                    return self.mapper.strip(r[:-(n-k)])
+
+            # Correct the errors found from the syndromes we already have.
+            # Most corrupted words have exactly one bad symbol, _error_pattern
+            # finds those in a table without running the general decoder.
+            c = [0] * (n - len(symbols)) + symbols
+            for j, e in self._error_pattern(syn):
+                c[n-1-j] = (c[n-1-j] - e) % self.b
+            ret = self.mapper.encode(c[:k])
+            if nostrip:
+                return ret
+            else:
+                return self.mapper.strip(ret)
+        elif self._verify(r):
             if nostrip:
                 return r[:-(n-k)]
             else:
                 return self.mapper.strip(r[:-(n-k)])
         
-        # Turn r into a polynomial
+        # Words longer than n. Turn r into a polynomial
         r = Polynomial(self.PFint(x) for x in self.mapper.decode(r))
 
-        # Compute the syndromes:
-        sz = self._syndromes(r)
+        # Compute the syndromes and from them the error positions j and
+        # magnitudes Y
+        j, Y = self._locate(self._syndromes(r))
+
+        # Put the error and locations together to form the error polynomial,
+        # it only has a term for each error
+        E = SparsePolynomial(dict(zip(j, Y)))
+
+        # And we get our real codeword!
+        c = r - E
+
+        # Form it back into a string and return all but the last n-k bytes
+        ret = self.mapper.encode(c.coefficients[:-(n-k)])
+
+        if nostrip:
+            # Polynomial objects don't store leading 0 coefficients, so we
+            # actually need to pad this to k bytes
+            return self.mapper.pad(ret, k)
+        else:
+            return ret
+
 
+    def _values(self, data):
+        """Returns data, a sequence of symbol values, as something indexable
+        that yields ints. Arrays and lists are used as they are, strings and
+        other buffers are viewed as one byte per symbol."""
+        if isinstance(data, (array, list, bytearray)):
+            return data
+        if isinstance(data, (str, buffer, memoryview)):
+            return bytearray(data)
+        return list(data)
+
+    def _output(self, like, values, out):
+        """Writes values into out if given and returns it, else returns them
+        in the same kind of sequence as like"""
+        if out is not None:
+            if len(out) < len(values):
+                raise ValueError("Output buffer holds %d symbols, %d needed" %
+                        (len(out), len(values)))
+            if isinstance(out, array):
+                out[:len(values)] = array(out.typecode, values)
+            elif isinstance(out, (bytearray, list)):
+                out[:len(values)] = values
+            else:
+                out[:len(values)] = str(bytearray(values))
+            return out
+        if isinstance(like, array):
+            return array(like.typecode, values)
+        if isinstance(like, str):
+            return str(bytearray(values))
+        if isinstance(like, (bytearray, buffer, memoryview)):
+            return bytearray(values)
+        return list(values)
+
+    def encode_symbols(self, message, out=None):
+        """Encodes message, a sequence of at most k symbol values such as an
+        array, a bytearray or any buffer of one byte per symbol, without
+        going through the mapper. Returns the message followed by its n-k
+        parity symbols, as the same kind of sequence, or writes them to the
+        start of out and returns out. Nothing is padded or stripped, a
+        message shorter than k is a shortened codeword."""
+        values = self._values(message)
+        if len(values) > self.k:
+            raise ValueError("Message length is max %d. Message was %d" %
+                    (self.k, len(values)))
+        if len(values) and not 0 <= min(values) <= max(values) < self.b:
+            raise ValueError("Message contains values outside the field")
+        parity = self._parity(values)
+        if isinstance(values, array):
+            code = values + array(values.typecode, parity)
+        else:
+            code = values + type(values)(parity)
+        return self._output(message, code, out)
+
+    def _code_values(self, code):
+        """_values for a codeword, raises ValueError unless it has between
+        n-k and n symbols, all of them field elements"""
+        values = self._values(code)
+        if not self.n - self.k <= len(values) <= self.n:
+            raise ValueError("Codeword length must be between %d and %d. "
+                    "Codeword was %d" % (self.n - self.k, self.n, len(values)))
+        if not 0 <= min(values) <= max(values) < self.b:
+            raise ValueError("Codeword contains values outside the field")
+        return values
+
+    def verify_symbols(self, code):
+        """True if code, a sequence of at most n symbol values, is a
+        codeword, see encode_symbols()"""
+        values = self._code_values(code)
+        return not any(self._syndrome_list(values))
+
+    def decode_symbols(self, code, out=None):
+        """Decodes code, a sequence of at most n symbol values as returned by
+        encode_symbols(). Returns the message symbols, all but the last n-k,
+        corrected, as the same kind of sequence, or writes them to out.
+        Raises DecodeError like decode()."""
+        values = self._code_values(code)
+        length = len(values)
+        m = length - (self.n - self.k)
+        syn = self._syndrome_list(values)
+        if not any(syn):
+            return self._output(code, values[:m], out)
+
+        message = values[:m]
+        if not isinstance(message, (array, bytearray)):
+            message = list(message)
+        for j, e in self._error_pattern(syn):
+            if j >= length:
+                raise DecodeError("Error located outside the codeword "
+                        "(position %d)" % j)
+            i = length - 1 - j
+            if i < m:
+                message[i] = (message[i] - e) % self.b
+        return self._output(code, message, out)
+
+    def encode_many(self, messages, workers=None, nostrip=False):
+        """Encodes every message in the iterable messages, returns a list of
+        the codewords in the same order. The work is spread over a pool of
+        workers threads. Under the GIL this only pays off when other threads
+        block, on free-threaded builds of Python it scales with cores."""
+        return self._map(lambda m: self.encode(m, nostrip=nostrip),
+                messages, workers)
+
+    def decode_many(self, codes, workers=None, nostrip=False):
+        """Decodes every codeword in the iterable codes across a thread pool,
+        see encode_many(). Returns a list of the messages in the same order,
+        an exception from any decode is raised here."""
+        return self._map(lambda r: self.decode(r, nostrip=nostrip),
+                codes, workers)
+
+    def mint_range(self, start, count, nostrip=False):
+        """Generates the codewords of the integers start to start+count-1,
+        each written in base b and encoded as encode() would.
+
+        The parity is linear in the message, and going from one integer to
+        the next adds 1 mod b to each digit that changes: the lowest digit
+        and every digit a carry passes (b-1 wraps around to 0). So the next
+        parity is the previous one plus the sum of the parities of the unit
+        messages at those positions, which are precomputed as running sums.
+        A codeword costs one addition of n-k symbols instead of an encode."""
+        b = self.b
+        k = self.k
+        if start < 0 or count < 0:
+            raise ValueError("start and count must not be negative")
+        if start + count > b ** k:
+            raise ValueError("%d does not fit in %d base %d digits" %
+                    (start + count - 1, k, b))
+        if not count:
+            return
+
+        digits = [0] * k
+        x = start
+        for i in xrange(k-1, -1, -1):
+            x, digits[i] = divmod(x, b)
+        parity = self._parity(digits)
+
+        # carried[c] is the parity change when the c+1 lowest digits change
+        carried = []
+        total = [0] * (self.n - k)
+        for i in xrange(k):
+            unit = self._parity([1] + [0] * i)
+            total = [(x + y) % b for x, y in zip(total, unit)]
+            carried.append(total)
+
+        chars = [self.mapper.encode(x) for x in xrange(b)]
+        message = [chars[x] for x in digits]
+        strip = self.mapper.strip
+        zero = chars[0]
+        for _ in xrange(count):
+            code = ''.join(message) + ''.join([chars[x] for x in parity])
+            if nostrip:
+                yield code
+            else:
+                yield strip(code) or zero
+
+            # Increment, carrying through the digits that wrap around
+            i = k - 1
+            while digits[i] == b - 1 and i:
+                digits[i] = 0
+                message[i] = zero
+                i -= 1
+            digits[i] += 1
+            if digits[i] < b:
+                message[i] = chars[digits[i]]
+            parity = [(x + y) % b for x, y in zip(parity, carried[k-1-i])]
+
+    def _map(self, func, items, workers):
+        items = list(items)
+        if workers == 1 or len(items) < 2:
+            return map(func, items)
+        if ThreadPoolExecutor is not None:
+            with ThreadPoolExecutor(workers) as pool:
+                return list(pool.map(func, items))
+
+        # Python 2 without the futures backport
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(workers)
+        try:
+            return pool.map(func, items)
+        finally:
+            pool.close()
+            pool.join()
+
+    def _locate(self, sz):
+        """Given the syndrome polynomial, returns a list j of error positions
+        and a corresponding list Y of error magnitudes"""
         # Find the error locator polynomial and error evaluator polynomial
-        # using the Berlekamp-Massey algorithm
-        sigma, omega = self._berlekamp_massey(sz)
+        # using the configured key equation solver (Berlekamp-Massey unless
+        # told otherwise)
+        sigma, omega = self.decoder.solve(self, sz)
+        if sigma is None:
+            raise DecodeError("Too many errors to correct (no error locator)")
+
+        # A locator of degree v means v errors, more than (n-k)/2 can't be
+        # corrected. Give up before the expensive part.
+        if sigma.degree() > (self.n - self.k) // 2:
+            raise DecodeError("Too many errors to correct (locator has degree %d)"
+                    % sigma.degree())
 
         # Now use Chien's procedure to find the error locations
         # j is an array of integers representing the positions of the errors, 0
         # being the rightmost byte
         # X is a corresponding array of GF(2^8) values where X_i = alpha^(j_i)
-        X, j = self._chien_search(sigma)
+        X, j = self._chien_search(sigma, self.n)
+
+        # sigma has to split into distinct roots, one per error
+        if len(j) != sigma.degree():
+            raise DecodeError("Too many errors to correct (locator has %d roots, "
+                    "expected %d)" % (len(j), sigma.degree()))
 
         # And finally, find the error magnitudes with Forney's Formula
         # Y is an array of GF(2^8) values corresponding to the error magnitude
         # at the position given by the j array
         Y = self._forney(omega, X)
+        if not all(Y):
+            raise DecodeError("Too many errors to correct (zero error magnitude)")
 
-        # Put the error and locations together to form the error polynomial
-        Elist = []
-        for i in xrange(self.b-1):
-            if i in j:
-                Elist.append(self.PFint(Y[j.index(i)]))
-            else:
-                Elist.append(self.PFint(0))
-        E = Polynomial(reversed(Elist))
-
-        # And we get our real codeword!
-        c = r - E
+        return j, Y
 
-        # Form it back into a string and return all but the last n-k bytes
-        ret = self.mapper.encode(c.coefficients[:-(n-k)])
+    def recover(self, symbols, erased):
+        """Given a codeword whose symbols at the indexes in erased are lost,
+        returns it with those symbols filled in. symbols is a string or a
+        list of symbol values, the lost ones can hold anything, and the
+        result is of the same kind. Up to n-k symbols can be recovered.
 
-        if nostrip:
-            # Polynomial objects don't store leading 0 coefficients, so we
-            # actually need to pad this to k bytes
-            return self.mapper.pad(ret, k)
-        else:
-            return ret
+        No syndromes are computed and no locator is solved for, so the other
+        symbols are taken to be right. If they aren't, the result is not a
+        codeword, which verify() will tell.
 
+        Each lost symbol is a fixed linear combination of the others, with
+        weights that only depend on the length of the word and on which
+        symbols are lost, see _erasure_weights. They are cached per pattern,
+        so a pattern seen before costs one dot product per lost symbol.
+        """
+        as_string = isinstance(symbols, basestring)
+        word = self._symbols(symbols) if as_string else list(symbols)
+        length = len(word)
+        if length > self.n:
+            raise ValueError("Codeword length is max %d. Codeword was %d" %
+                    (self.n, length))
+        erased = tuple(sorted(set(erased)))
+        if not erased:
+            return symbols
+        if erased[0] < 0 or erased[-1] >= length:
+            raise IndexError("Erased symbol index out of range")
+        if len(erased) > self.n - self.k:
+            raise DecodeError("Too many erasures to recover (%d, at most %d)" %
+                    (len(erased), self.n - self.k))
+
+        key = (length, erased)
+        weights = self.erasure_cache.get(key)
+        if weights is None:
+            weights = self._erasure_weights(length, erased)
+            self.erasure_cache.put(key, weights)
+        survivors, rows = weights
+
+        b = self.b
+        known = [word[i] for i in survivors]
+        for i, row in zip(erased, rows):
+            word[i] = sum(w * c for w, c in zip(row, known)) % b
+        if as_string:
+            return self.mapper.encode(word)
+        return word
+
+    def _erasure_weights(self, length, erased):
+        """Returns the indexes of the symbols that are left and, for each
+        erased index, the weights of those symbols that sum to it.
+
+        With X_i = α^j for the symbol at the coefficient of x^j, a codeword
+        has sum c_i X_i^l = 0 for l = 1..n-k. With e lost symbols, the first
+        e of those are a Vandermonde system in them. Solving it by Lagrange
+        interpolation at the lost X_s gives the weight of a known symbol X_j
+        in lost symbol s as
+
+            -X_j l(X_j) β_s / ((X_j - X_s) X_s)
+
+        where l(x) is the product of the (x - X_s) and β_s = 1/l'(X_s) is the
+        barycentric weight of X_s."""
+        b = self.b
+        inv = PFint.invtable[b]
+        exptable = self.exptable
+        lost = set(erased)
+        survivors = tuple(i for i in xrange(length) if i not in lost)
+        xs = [exptable[(length-1-i) % (b-1)] for i in erased]
+
+        # β_s/X_s
+        scale = []
+        for s, x in enumerate(xs):
+            prod = x
+            for t, y in enumerate(xs):
+                if t != s:
+                    prod = prod * (x - y) % b
+            scale.append(inv[prod])
+
+        rows = [[] for _ in erased]
+        for i in survivors:
+            xj = exptable[(length-1-i) % (b-1)]
+            ell = 1
+            for x in xs:
+                ell = ell * (xj - x) % b
+            f = -xj * ell % b
+            for row, x, c in zip(rows, xs, scale):
+                row.append(f * c * inv[(xj - x) % b] % b)
+        return survivors, rows
+
+    def _error_pattern(self, syn):
+        """Given the syndrome list as returned by _syndrome_list, returns the
+        errors as a list of (j, e) pairs, e being the magnitude of the error
+        at the coefficient of x^j"""
+        if not any(syn):
+            return []
+        fix = self._single_error(syn)
+        if fix is not None:
+            return [fix]
+        sz = Polynomial(self.PFint(x) for x in reversed([0] + list(syn)))
+        j, Y = self._locate(sz)
+        return [(jl, int(Yl)) for jl, Yl in zip(j, Y)]
+
+    def _checked_pattern(self, syn, length):
+        """_error_pattern for a word of the given length, or None if it has
+        more errors than the code corrects"""
+        b = self.b
+        exptable = self.exptable
+        try:
+            pattern = self._error_pattern(syn)
+        except Exception:
+            return None
+        if len(pattern) > (self.n - self.k) // 2:
+            return None
+
+        # The decoder has no way to tell when it fails, so check that the
+        # errors it found really account for the syndromes
+        check = [0] * len(syn)
+        for j, e in pattern:
+            if not 0 <= j < length or not e % b:
+                return None
+            check = [(s + e * exptable[l * j % (b-1)]) % b
+                    for l, s in enumerate(check, 1)]
+        if check != list(syn):
+            return None
+        return pattern
+
+    def syndrome_state(self, code):
+        """Returns a SyndromeState for code, which keeps its syndromes up to
+        date as single symbols are edited"""
+        return SyndromeState(self, code)
+
+    def scan(self, source, length=None, correctable=False):
+        """Yields the offsets of codewords of length symbols, by default n,
+        found in source, a string, mmap or file object. With correctable,
+        also of words that decode() would correct. See scanner.py."""
+        return scanner.scan(self, source, length, correctable)
 
     def _syndromes(self, r):
         """Given the received codeword r in the form of a Polynomial object,
@@ -243,6 +920,11 @@ class RSCoder(object):
         """
         n = self.n
         k = self.k
+        if (self.ntt_syndromes and len(r) <= self.ntt.size
+                and self._transform() is not None):
+            s = [0] + self._syndrome_list_ntt([int(x) for x in r.coefficients])
+            return Polynomial(self.PFint(x) for x in reversed(s))
+
         # s[l] is the received codeword evaluated at α^l for 1 <= l <= s
         # α in this implementation is 2
         s = [self.PFint(0)] # s[0] is 0 (coefficient of z^0)
@@ -257,6 +939,95 @@ class RSCoder(object):
 
         return sz
 
+    def _parity(self, message):
+        """Given a message as a list of at most k symbol values, returns the
+        n-k parity symbols encode() would append to it, computed on plain
+        ints instead of Polynomial objects"""
+        kernel = self.kernels['encode']
+        if kernel == 'swar':
+            self._check_lanes(message)
+            return self.swar_parity * self.swar.pack(message)
+        if kernel == 'codegen':
+            return self.codegen_parity(message)
+        return self._parity_direct(message)
+
+    def _check_lanes(self, symbols):
+        """Raises ValueError unless every symbol value is a field element.
+        The lanes of a packed int only have room for those, and a -1 from a
+        character outside the alphabet doesn't pack at all."""
+        if symbols and not 0 <= min(symbols) <= max(symbols) < self.b:
+            raise ValueError("Symbol values must be between 0 and %d, "
+                    "characters outside the alphabet?" % (self.b - 1))
+
+    def _parity_direct(self, message):
+        "_parity with a division register"
+        b = self.b
+        taps = self.generator_taps
+        reg = [0] * len(taps)
+        for c in message:
+            # reg holds the remainder of the message so far times x^(n-k)
+            # divided by g, highest power first
+            fb = (c + reg[0]) % b
+            reg.append(0)
+            del reg[0]
+            if fb:
+                reg = [(r + fb * t) % b for r, t in zip(reg, taps)]
+        return [-r % b for r in reg]
+
+    def _syndrome_list(self, symbols):
+        """Given a codeword as a list of symbol values, highest power first,
+        returns the list of syndromes [S_1, ..., S_(n-k)] as plain ints.
+        S_l is the codeword evaluated at α^l."""
+        kernel = self.kernels['syndromes']
+        if kernel == 'swar' and len(symbols) <= self.n:
+            self._check_lanes(symbols)
+            return self.swar_syndromes * self.swar.pack(symbols)
+        if (kernel == 'ntt' and len(symbols) <= self.ntt.size
+                and self._transform() is not None):
+            return self._syndrome_list_ntt(symbols)
+        if kernel == 'numpy' and len(symbols) <= self.n:
+            return self._syndrome_list_numpy(symbols)
+        return self._syndrome_list_direct(symbols)
+
+    def _syndrome_list_ntt(self, symbols, ntt=None):
+        """_syndrome_list by way of the transform of the codeword, whose
+        entries 1 through n-k are the syndromes"""
+        ntt = ntt or self.ntt
+        return ntt.transform(symbols[::-1])[1:self.n-self.k+1]
+
+    def _syndrome_list_numpy(self, symbols):
+        "_syndrome_list as a product with the matrix of the α^(l*j)"
+        v = numpy.array(symbols, dtype=numpy.int64)
+        s = self.numpy_syndromes[:, self.n-len(symbols):].dot(v) % self.b
+        return [int(x) for x in s]
+
+    def _syndrome_list_direct(self, symbols):
+        "_syndrome_list evaluating at each of the n-k points"
+        b = self.b
+        xs = self.syndrome_points
+        s = [0] * len(xs)
+        for c in symbols:
+            # Horner's rule for all n-k evaluation points at once
+            s = [(sl * x + c) % b for sl, x in zip(s, xs)]
+        return s
+
+    def _single_error(self, syn):
+        """Given the syndrome list, returns (j, e) if it is the signature of
+        a single error of magnitude e at the coefficient of x^j, else None.
+        This is one division and a dict lookup."""
+        if len(syn) < 2 or not syn[0]:
+            return None
+        b = self.b
+        ratio = syn[1] * PFint.invtable[b][syn[0]] % b
+        for l in xrange(2, len(syn)):
+            if syn[l] != syn[l-1] * ratio % b:
+                return None
+        try:
+            j, inv = self.single_errors[ratio]
+        except KeyError:
+            return None
+        return j, syn[0] * inv % b
+
     def _berlekamp_massey(self, s):
         """Computes and returns the error locator polynomial (sigma) and the
         error evaluator polynomial (omega)
@@ -356,7 +1127,7 @@ class RSCoder(object):
 
         return sigma[-1], omega[-1]
 
-    def _chien_search(self, sigma):
+    def _chien_search(self, sigma, n=None):
         """Recall the definition of sigma, it has s roots. To find them, this
         function evaluates sigma at all 255 non-zero points to find the roots
         The inverse of the roots are X_i, the error locations
@@ -365,22 +1136,40 @@ class RSCoder(object):
         error positions (the discrete log of the corresponding X value) The
         lists are up to s elements large.
 
+        If n is given, a root at a position of n or more (past the start of a
+        shortened codeword) raises DecodeError right away, and the search
+        stops once it has found as many roots as sigma's degree.
+
         Important technical math note: This implementation is not actually
         Chien's search. Chien's search is a way to evaluate the polynomial
         such that each evaluation only takes constant time. This here simply
         does 255 evaluations straight up, which is much less efficient.
+        When the coder has an NTT that is cheaper than evaluating sigma term
+        by term, all evaluations are done at once with it instead.
         """
 
         X = []
         j = []
         p = self.a
-        for l in xrange(1,self.b-1):
+        if (self.kernels['roots'] == 'ntt' and self.ntt.cost < sigma.degree() + 1
+                and self._transform() is not None):
+            values = self.ntt.transform([int(c) for c in reversed(sigma.coefficients)])
+            roots = (l for l, v in enumerate(values) if v == 0)
+        else:
             # These evaluations could be more efficient, but oh well
-            if sigma.evaluate( p**l ) == 0:
-                X.append( (p**(-l)))
-                # This is different than the notes, I think the notes were in error
-                # Notes said j values were just l, when it's actually 255-l
-                j.append((self.b-1) - l)
+            roots = (l for l in xrange(0,self.b-1) if sigma.evaluate( p**l ) == 0)
+        for l in roots:
+            X.append( (p**(-l)))
+            # This is different than the notes, I think the notes were in error
+            # Notes said j values were just l, when it's actually 255-l
+            # α^0 is a root when the last symbol (j = 0) is in error
+            j.append(((self.b-1) - l) % (self.b-1))
+            if n is not None:
+                if j[-1] >= n:
+                    raise DecodeError("Error located outside the codeword "
+                            "(position %d)" % j[-1])
+                if len(j) == sigma.degree():
+                    break
 
         return X, j
 
@@ -0,0 +1,82 @@
+# encoding: UTF-8
+# Copyright (c) 2014 Ryan Castellucci <code@ryanc.org>
+# See LICENSE.txt for license terms
+
+from collections import deque
+
+"""Finding codewords inside larger text.
+
+scan() slides a window of L symbols over the text, one character at a time,
+and keeps the syndromes of the window up to date instead of recomputing
+them. With the window w_0 ... w_(L-1), w_0 at the coefficient of x^(L-1),
+
+    S_l = sum w_i α^(l*(L-1-i))
+
+Dropping w_0 and appending c gives
+
+    S'_l = α^l S_l - w_0 α^(l*L) + c
+
+which is O(n-k) per character. Before the window has filled up, w_0 is zero
+and this is Horner's rule. A character outside the alphabet can't be part of
+a codeword, so the window starts over after it.
+
+Only the current chunk of the input and the window are held in memory.
+"""
+
+def _chunks(source, chunk_size):
+    "Yields the text of source, a string, mmap or file object, in chunks"
+    if hasattr(source, 'read'):
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    else:
+        for start in xrange(0, len(source), chunk_size):
+            yield source[start:start+chunk_size]
+
+def scan(coder, source, length=None, correctable=False, chunk_size=1 << 16):
+    """Yields the offset of every run of length characters in source that
+    is a codeword of coder, by default runs of n characters. source is a
+    string, an mmap or a file object opened for reading.
+
+    With correctable, also yields runs that decode() would correct. That
+    runs the decoder on every window that isn't a codeword, so it is far
+    slower."""
+    b = coder.b
+    if length is None:
+        length = coder.n
+    if not 0 < length <= coder.n:
+        raise ValueError("length must be between 1 and %d" % coder.n)
+    c2n = coder._symbol_table()
+    points = coder.syndrome_points
+    # α^(l*L), the weight the symbol leaving the window had
+    leaving = [coder.exptable[l * length % (b-1)]
+            for l in xrange(1, coder.n - coder.k + 1)]
+
+    syn = [0] * len(points)
+    window = deque()
+    offset = 0
+    for chunk in _chunks(source, chunk_size):
+        for ch in chunk:
+            offset += 1
+            c = c2n.get(ch)
+            if c is None:
+                syn = [0] * len(points)
+                window.clear()
+                continue
+            window.append(c)
+            if len(window) > length:
+                old = window.popleft()
+                syn = [(s * x + c - old * y) % b
+                        for s, x, y in zip(syn, points, leaving)]
+            else:
+                syn = [(s * x + c) % b for s, x in zip(syn, points)]
+                if len(window) < length:
+                    continue
+            if not any(syn):
+                yield offset - length
+            elif correctable and coder._checked_pattern(syn, length) is not None:
+                yield offset - length
+
+# vim: sw=4 ts=4 et ai si bg=dark
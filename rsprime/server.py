@@ -0,0 +1,203 @@
+# encoding: UTF-8
+# Copyright (c) 2014 Ryan Castellucci <code@ryanc.org>
+# See LICENSE.txt for license terms
+
+import argparse
+import json
+import os
+import signal
+import socket
+import stat
+import sys
+import threading
+import Queue
+import SocketServer
+from multiprocessing import Pool
+
+from rscoder import RSCoder
+from client import default_path, recv_frame, send_frame
+
+"""A daemon that keeps warm coders for short lived clients.
+
+`python rsprime serve` builds an RSCoder for each configured (b, n, k), or
+loads it from a table file, then listens on a Unix socket. Requests are
+handed to a small pool of worker processes. The coders are built before the
+pool starts, so the forked workers inherit them with their tables already
+filled in. See client.py for the protocol.
+
+Each connection is read by one thread, which passes every request to the
+pool as soon as it arrives, and answered by another, which writes the
+results back in request order. A client can keep many requests in flight.
+"""
+
+# (b, n, k) -> RSCoder, in the daemon and in its workers
+_coders = {}
+_default = [None]
+
+def _init(specs, tables):
+    """Pool initializer. Moves the worker out of the daemon's process group,
+    so ^C or a kill of the group reaches only the daemon, which then stops
+    the pool. A worker killed while it holds the pool's queue lock would hang
+    that. Builds the coders if the worker wasn't forked."""
+    os.setpgrp()
+    if not _coders:
+        _load(specs, tables)
+
+def _load(specs, tables):
+    "Builds the coders and returns them in order"
+    coders = [RSCoder(b, n, k) for b, n, k in specs]
+    coders.extend(RSCoder.from_tables(path) for path in tables)
+    for coder in coders:
+        _coders[coder.b, coder.n, coder.k] = coder
+    if coders and _default[0] is None:
+        _default[0] = (coders[0].b, coders[0].n, coders[0].k)
+    return coders
+
+def _handle(payload):
+    "Runs one request in a worker, returns the response as JSON"
+    try:
+        request = json.loads(payload)
+        if 'b' in request:
+            key = (request['b'], request['n'], request['k'])
+        else:
+            key = _default[0]
+        coder = _coders.get(key)
+        if coder is None:
+            raise ValueError("No coder for (b, n, k) = %r" % (key,))
+        data = request['data'].encode('utf-8')
+        op = request['op']
+        if op == 'encode':
+            result = coder.encode(data, nostrip=request.get('nostrip', False))
+        elif op == 'verify':
+            result = coder.verify(data)
+        elif op == 'decode':
+            result = coder.decode(data, nostrip=request.get('nostrip', False))
+        else:
+            raise ValueError("Unknown op %r" % (op,))
+    except Exception as e:
+        return json.dumps({'error': e.__class__.__name__, 'message': str(e)})
+    return json.dumps({'result': result})
+
+class _Handler(SocketServer.BaseRequestHandler):
+    def handle(self):
+        pending = Queue.Queue()
+        writer = threading.Thread(target=self._write, args=(pending,))
+        writer.daemon = True
+        writer.start()
+        try:
+            while True:
+                try:
+                    payload = recv_frame(self.request)
+                except (ValueError, socket.error):
+                    break
+                if payload is None:
+                    break
+                pending.put(self.server.pool.apply_async(_handle, (payload,)))
+        finally:
+            pending.put(None)
+            writer.join()
+
+    def _write(self, pending):
+        broken = False
+        while True:
+            result = pending.get()
+            if result is None:
+                return
+            response = result.get()
+            if broken:
+                # Keep draining so the reader never blocks on us
+                continue
+            try:
+                send_frame(self.request, response)
+            except socket.error:
+                broken = True
+
+class Server(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path=None, specs=((59, 58, 52),), tables=(), workers=2):
+        """Builds the coders for specs, a list of (b, n, k), and for the
+        table files in tables, starts workers processes and binds the socket
+        at path, by default client.default_path(). Call serve_forever() to
+        start answering and close() to stop."""
+        self.path = path or default_path()
+        _clear_stale(self.path)
+        self.coders = _load(specs, tables)
+        if not self.coders:
+            raise ValueError("No coders configured")
+        self.pool = Pool(workers, _init, (list(specs), list(tables)))
+        SocketServer.UnixStreamServer.__init__(self, self.path, _Handler)
+
+    def close(self):
+        self.server_close()
+        self.pool.terminate()
+        self.pool.join()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+def _clear_stale(path):
+    """Removes a socket of ours left behind by a daemon that died, refuses
+    to start if one is still listening or if the path is anything else"""
+    if not os.path.lexists(path):
+        return
+    info = os.lstat(path)
+    if not stat.S_ISSOCK(info.st_mode):
+        raise ValueError("%s exists and is not a socket" % path)
+    if info.st_uid != os.getuid():
+        raise ValueError("%s belongs to another user" % path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except socket.error:
+        os.unlink(path)
+    else:
+        raise ValueError("A daemon is already listening on %s" % path)
+    finally:
+        sock.close()
+
+def _spec(text):
+    try:
+        b, n, k = map(int, text.split(','))
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected b,n,k, got %r" % text)
+    return b, n, k
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='rsprime serve',
+            description="Serve encode, verify and decode over a Unix socket")
+    parser.add_argument('--socket', help="socket path, default $RSPRIME_SOCKET "
+            "or %s" % default_path())
+    parser.add_argument('--code', type=_spec, action='append', default=[],
+            metavar='B,N,K', help="a code to serve, may be repeated "
+            "(default 59,58,52, the first one is used by default)")
+    parser.add_argument('--tables', action='append', default=[],
+            metavar='PATH', help="serve the code of a table file")
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args(argv)
+
+    specs = args.code
+    if not specs and not args.tables:
+        specs = [(59, 58, 52)]
+    try:
+        server = Server(args.socket, specs, args.tables, args.workers)
+    except ValueError as e:
+        sys.stderr.write("rsprime serve: %s\n" % e)
+        return 1
+    print "serving %s on %s" % (', '.join('(%d,%d,%d)' % (c.b, c.n, c.k)
+        for c in server.coders), server.path)
+    # Clean up on kill too, not only ^C
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
+
+# vim: sw=4 ts=4 et ai si bg=dark
@@ -0,0 +1,276 @@
+# encoding: UTF-8
+# Copyright (c) 2014 Ryan Castellucci <code@ryanc.org>
+# See LICENSE.txt for license terms
+
+import argparse
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+
+from rscoder import RSCoder
+
+"""Sidecar parity files for large files of symbols.
+
+protect() memory maps a file, walks its symbols in stripes of k and writes
+only the n-k parity symbols of each stripe to a sidecar file. The data file
+itself is left alone. repair() maps both files, checks every stripe and
+patches corrupted symbols back into the data file in place.
+
+Spaces, tabs and line breaks separate records and are not part of any
+stripe, every other byte is a symbol position. A byte that isn't in the
+alphabet is taken as a corrupted symbol by repair(), so substitutions are
+repairable, but bytes inserted or removed are not. The last stripe may be
+shorter than k, it is encoded as if padded with leading zero symbols.
+
+Sidecar layout (little endian): magic 'RSPS', version (H), two pad bytes,
+b, n, k (3 x I), the number of symbols protected (Q), followed by n-k parity
+symbols per stripe, one byte each.
+
+Run it as `python rsprime protect FILE` and `python rsprime repair FILE`.
+"""
+
+MAGIC = 'RSPS'
+VERSION = 1
+SUFFIX = '.rsp'
+
+_header = struct.Struct('<4sHxxIIIQ')
+
+WHITESPACE = ' \t\r\n'
+_symbol_re = re.compile(r'[^ \t\r\n]')
+
+# Stands in for bytes that aren't symbols after translation
+INVALID = '\xff'
+
+def _translation(coder):
+    """Returns a str.translate() table mapping every character that stands
+    for a symbol of coder to the byte holding its value"""
+    if coder.b > 255:
+        raise ValueError("File mode works on byte sized symbols, b must be below 256")
+    table = [INVALID] * 256
+    for ch, value in coder._symbol_table().items():
+        table[ord(ch)] = chr(value)
+    return ''.join(table)
+
+def _open(path, write=False):
+    "Returns the open file and a mmap of it (or '' when it's empty)"
+    f = open(path, 'r+b' if write else 'rb')
+    if os.fstat(f.fileno()).st_size == 0:
+        # Empty files can't be mapped
+        return f, ''
+    access = mmap.ACCESS_WRITE if write else mmap.ACCESS_READ
+    return f, mmap.mmap(f.fileno(), 0, access=access)
+
+class _StripeReader(object):
+    """Iterates over (index, stripe) where stripe is a str of up to k symbol
+    values and index is the position of its first symbol among all symbols
+    of buf. Reads buf chunk_size bytes at a time, so memory use is bounded.
+    offset() maps a symbol index back to a byte offset in buf."""
+    def __init__(self, buf, table, k, chunk_size=1 << 20):
+        self.buf = buf
+        self.table = table
+        self.k = k
+        self.chunk_size = chunk_size
+        # [byte start, byte end, first symbol index, symbol end, offsets]
+        self.chunks = []
+
+    def __iter__(self):
+        buf = self.buf
+        k = self.k
+        carry = ''
+        base = 0
+        symbols = 0
+        for start in xrange(0, len(buf), self.chunk_size):
+            end = min(start + self.chunk_size, len(buf))
+            chunk = buf[start:end].translate(self.table, WHITESPACE)
+            self.chunks.append([start, end, symbols, symbols + len(chunk), None])
+            symbols += len(chunk)
+
+            syms = carry + chunk
+            i = 0
+            while i + k <= len(syms):
+                yield base, syms[i:i+k]
+                i += k
+                base += k
+                # Forget chunks that no stripe still to come refers to
+                while self.chunks and self.chunks[0][3] <= base:
+                    del self.chunks[0]
+            carry = syms[i:]
+        if carry:
+            yield base, carry
+
+    def offset(self, index):
+        "Byte offset of the symbol with the given index"
+        for chunk in self.chunks:
+            if chunk[2] <= index < chunk[3]:
+                if chunk[4] is None:
+                    chunk[4] = [m.start() for m in
+                            _symbol_re.finditer(self.buf, chunk[0], chunk[1])]
+                return chunk[4][index - chunk[2]]
+        raise IndexError("Symbol %d is not in a buffered chunk" % index)
+
+def protect(coder, path, sidecar_path=None):
+    """Writes the parity of the file at path to sidecar_path, by default
+    path + '.rsp'. Returns the number of symbols protected."""
+    if sidecar_path is None:
+        sidecar_path = path + SUFFIX
+    table = _translation(coder)
+
+    f, buf = _open(path)
+    try:
+        with open(sidecar_path, 'wb') as out:
+            out.write(_header.pack(MAGIC, VERSION, coder.b, coder.n, coder.k, 0))
+            count = 0
+            reader = _StripeReader(buf, table, coder.k)
+            for index, stripe in reader:
+                bad = stripe.find(INVALID)
+                if bad >= 0:
+                    raise ValueError("%s: byte at offset %d is not a symbol" %
+                            (path, reader.offset(index + bad)))
+                parity = coder._parity(bytearray(stripe))
+                out.write(array('B', parity).tostring())
+                count += len(stripe)
+
+            # The symbol count is only known now
+            out.seek(0)
+            out.write(_header.pack(MAGIC, VERSION, coder.b, coder.n, coder.k, count))
+    finally:
+        if buf:
+            buf.close()
+        f.close()
+    return count
+
+def _count(buf, chunk_size=1 << 20):
+    "Number of symbol positions in buf"
+    return sum(len(buf[start:start+chunk_size].translate(None, WHITESPACE))
+            for start in xrange(0, len(buf), chunk_size))
+
+def _correct(coder, code):
+    """Given a stripe and its parity as a list of symbol values, returns the
+    corrected list, or None if it has more errors than the code corrects.
+    Errors placed in the padding of a short stripe count as too many."""
+    pattern = coder._checked_pattern(coder._syndrome_list(code), len(code))
+    if pattern is None:
+        return None
+    fixed = list(code)
+    for j, e in pattern:
+        i = len(code) - 1 - j
+        fixed[i] = (fixed[i] - e) % coder.b
+    return fixed
+
+def repair(path, sidecar_path=None, mapper=None, dry_run=False):
+    """Checks the file at path against its sidecar and fixes corrupted
+    symbols in place, in both files. With dry_run nothing is written.
+
+    Returns a dict with the number of stripes checked, the number found
+    corrupted, the number of symbols fixed and a list of the indexes of
+    stripes that could not be fixed."""
+    if sidecar_path is None:
+        sidecar_path = path + SUFFIX
+
+    sf, side = _open(sidecar_path, write=not dry_run)
+    try:
+        if len(side) < _header.size:
+            raise ValueError("%s is not a sidecar file" % sidecar_path)
+        magic, version, b, n, k, count = _header.unpack_from(side, 0)
+        if magic != MAGIC:
+            raise ValueError("%s is not a sidecar file" % sidecar_path)
+        if version != VERSION:
+            raise ValueError("Unsupported sidecar version %d" % version)
+        m = n - k
+        stripes = (count + k - 1) // k
+        if len(side) != _header.size + stripes * m:
+            raise ValueError("%s is truncated or corrupt" % sidecar_path)
+
+        coder = RSCoder(b, n, k, mapper)
+        table = _translation(coder)
+        encode = coder.mapper.encode
+
+        report = {'stripes': 0, 'corrupted': 0, 'fixed': 0, 'failed': []}
+        f, buf = _open(path, write=not dry_run)
+        try:
+            # Stripes after an insertion or removal don't line up with their
+            # parity, find out before patching anything
+            seen = _count(buf)
+            if seen != count:
+                raise ValueError("%s has %d symbols, its sidecar protects %d. "
+                        "Symbols were inserted or removed." % (path, seen, count))
+
+            reader = _StripeReader(buf, table, k)
+            for index, stripe in reader:
+                s = index // k
+                report['stripes'] += 1
+
+                at = _header.size + s * m
+                raw = bytearray(stripe + side[at:at+m])
+                # Bytes that aren't symbols are errors at a known place, any
+                # value will do for them
+                code = [x if x < b else 0 for x in raw]
+                if max(raw) < b and not any(coder._syndrome_list(code)):
+                    continue
+
+                report['corrupted'] += 1
+                fixed = _correct(coder, code)
+                if fixed is None:
+                    report['failed'].append(s)
+                    continue
+
+                for i, value in enumerate(fixed):
+                    if value == raw[i]:
+                        continue
+                    report['fixed'] += 1
+                    if dry_run:
+                        continue
+                    if i < len(stripe):
+                        buf[reader.offset(index + i)] = encode(value)
+                    else:
+                        side[at + i - len(stripe)] = chr(value)
+        finally:
+            if buf:
+                if not dry_run:
+                    buf.flush()
+                buf.close()
+            f.close()
+    finally:
+        if side:
+            if not dry_run:
+                side.flush()
+            side.close()
+        sf.close()
+    return report
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='rsprime',
+            description="Sidecar parity files")
+    sub = parser.add_subparsers(dest='command')
+    p = sub.add_parser('protect', help="write a sidecar parity file")
+    p.add_argument('path')
+    p.add_argument('sidecar', nargs='?')
+    p.add_argument('-b', type=int, default=59, help="field order")
+    p.add_argument('-n', type=int, default=58, help="codeword length")
+    p.add_argument('-k', type=int, default=52, help="message length")
+    r = sub.add_parser('repair', help="fix a file from its sidecar")
+    r.add_argument('path')
+    r.add_argument('sidecar', nargs='?')
+    r.add_argument('--dry-run', action='store_true',
+            help="only report, don't write")
+    args = parser.parse_args(argv)
+
+    if args.command == 'protect':
+        count = protect(RSCoder(args.b, args.n, args.k), args.path, args.sidecar)
+        print "%d symbols protected" % count
+        return 0
+
+    report = repair(args.path, args.sidecar, dry_run=args.dry_run)
+    print "%(stripes)d stripes, %(corrupted)d corrupted, %(fixed)d symbols fixed" % report
+    if report['failed']:
+        print "could not fix stripes %s" % ', '.join(map(str, report['failed']))
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
+
+# vim: sw=4 ts=4 et ai si bg=dark
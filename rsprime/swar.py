@@ -0,0 +1,119 @@
+# encoding: UTF-8
+# Copyright (c) 2014 Ryan Castellucci <code@ryanc.org>
+# See LICENSE.txt for license terms
+
+from array import array
+from binascii import hexlify
+
+"""SIMD within a register for small prime fields, in pure Python.
+
+A vector of field elements is packed into one Python int, one element per
+lane of width bits, the first element in the most significant lane. With
+enough guard bits above each value, adding two packed ints adds the vectors
+and multiplying by a small int scales them, with no carries between lanes.
+Reduction modulo p is lazy, it only happens when values are unpacked.
+
+The same trick turns a matrix-vector product into one big multiplication.
+Packing row t of the matrix in reverse into its own block of L lanes, one
+block per row, the product of the packed vector and all packed rows holds
+the dot product of the vector with row t in the top lane of block t. The
+rest of the product of block t spills into block t+1, but never reaches its
+top lane, so lanes only need room for a sum of 2L products.
+RSCoder uses this for the syndromes (a Vandermonde matrix) and for the parity
+(the parity of each unit message), so a whole codeword costs a single
+multiplication plus packing and unpacking, which run in C.
+"""
+
+# Lane widths we can pack straight from an array, with their typecodes
+_widths = []
+for _tc in 'BHIL':
+    _bits = array(_tc).itemsize * 8
+    if _bits not in [w for w, _ in _widths]:
+        _widths.append((_bits, _tc))
+
+class SWAR(object):
+    """Packs vectors of GF(p) elements into ints with lanes wide enough to
+    hold a sum of terms products of two field elements. A PackedMatrix with
+    rows of length L needs 2L terms."""
+    def __init__(self, p, terms):
+        self.p = p
+        bound = terms * (p-1) ** 2
+        for width, typecode in _widths:
+            if bound < 1 << width:
+                break
+        else:
+            raise ValueError("GF(%d) with %d terms needs lanes wider than %d bits"
+                    % (p, terms, _widths[-1][0]))
+        self.width = width
+        self.typecode = typecode
+        self.digits = width // 4
+        self.mask = (1 << width) - 1
+
+    def pack(self, values):
+        """Packs a sequence of ints below 2**width, first value in the most
+        significant lane"""
+        a = array(self.typecode, values)
+        if not a:
+            return 0
+        if a.itemsize > 1 and array('H', [1]).tostring()[0] == '\x01':
+            # Little endian host, lanes have to be big endian
+            a.byteswap()
+        return int(hexlify(a.tostring()), 16)
+
+    def unpack(self, packed, count):
+        "Returns the count least significant lanes, first lane most significant"
+        d = self.digits
+        h = '%0*x' % (count * d, packed)
+        h = h[len(h) - count * d:]
+        return [int(h[i:i+d], 16) for i in xrange(0, len(h), d)]
+
+    def add(self, a, b):
+        "Lane by lane sum, the lanes must have room for it"
+        return a + b
+
+    def scale(self, a, s):
+        "Multiplies every lane by the int s, the lanes must have room for it"
+        return a * s
+
+    def reduce(self, a, count):
+        "Reduces each of the count lanes of a modulo p"
+        p = self.p
+        return self.pack([x % p for x in self.unpack(a, count)])
+
+    def matrix(self, rows):
+        "Returns a PackedMatrix for the given list of rows"
+        return PackedMatrix(self, rows)
+
+class PackedMatrix(object):
+    """A T x L matrix over GF(p) packed for products with vectors packed by
+    swar.pack, see the module docstring"""
+    def __init__(self, swar, rows):
+        self.swar = swar
+        self.rows = len(rows)
+        self.length = length = len(rows[0])
+        d = swar.digits
+
+        # Block t, counting from the least significant end, holds row t with
+        # its first entry in lane 0 of the block
+        blocks = []
+        for row in reversed(rows):
+            if len(row) != length:
+                raise ValueError("All rows must have the same length")
+            blocks.append(''.join('%0*x' % (d, x) for x in reversed(row)))
+        self.packed = int(''.join(blocks), 16)
+
+    def __mul__(self, vector):
+        """Given a vector of L lanes as returned by pack, returns the list of
+        T dot products with the rows, reduced modulo p"""
+        swar = self.swar
+        p = swar.p
+        d = swar.digits
+        # Pad to one block more than there are rows, the spill of the last
+        # one. The top lane of block t then starts (t+1) blocks from the end.
+        step = self.length * d
+        size = (self.rows + 1) * step
+        h = '%0*x' % (size, self.packed * vector)
+        return [int(h[i:i+d], 16) % p
+                for i in xrange(size - step, step - 1, -step)]
+
+# vim: sw=4 ts=4 et ai si bg=dark
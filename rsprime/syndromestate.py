@@ -0,0 +1,155 @@
+# encoding: UTF-8
+# Copyright (c) 2014 Ryan Castellucci <code@ryanc.org>
+# See LICENSE.txt for license terms
+
+class SyndromeState(object):
+    """The syndromes of a codeword, kept up to date as it is edited.
+
+    Syndromes are linear in the symbols. Changing the symbol at the
+    coefficient of x^j by δ changes each S_l by δ*α^(l*j), so replace() costs
+    O(n-k) no matter how long the word is.
+
+    insert() and delete() shift the symbols in front of the edit up or down
+    one power, which multiplies their part of S_l by α^l or α^-l. That part is
+    recomputed from whichever side of the edit is shorter, so editing at
+    either end is O(n-k) and the worst case is O(n*(n-k)/2). They only make
+    sense for shortened codes, a word never grows past n symbols.
+
+    Create one with RSCoder.syndrome_state(code).
+    """
+    def __init__(self, coder, code):
+        self.coder = coder
+        self.symbols = list(coder._symbols(code))
+        if len(self.symbols) > coder.n:
+            raise ValueError("Codeword length is max %d. Codeword was %d" %
+                    (coder.n, len(self.symbols)))
+        self.syndromes = coder._syndrome_list(self.symbols)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    @property
+    def code(self):
+        "The current word as a string"
+        return self.coder.mapper.encode(self.symbols)
+
+    @property
+    def valid(self):
+        "True if the current word is a codeword"
+        return not any(self.syndromes)
+
+    @property
+    def correctable(self):
+        "True if the current word is a codeword or decode() can fix it"
+        return self.errors() is not None
+
+    def errors(self):
+        """Returns the errors in the current word as a list of (i, symbol)
+        pairs, symbol being the corrected value of the symbol at index i,
+        or None if the word has more errors than the code corrects"""
+        b = self.coder.b
+        length = len(self.symbols)
+        pattern = self.coder._checked_pattern(self.syndromes, length)
+        if pattern is None:
+            return None
+        return sorted((length-1-j, (self.symbols[length-1-j] - e) % b)
+                for j, e in pattern)
+
+    def _value(self, symbol):
+        if isinstance(symbol, basestring):
+            value = self.coder.mapper.decode(symbol)
+        else:
+            value = symbol
+        if not 0 <= value < self.coder.b:
+            raise ValueError("Not a symbol: %r" % (symbol,))
+        return value
+
+    def _contribution(self, symbols, power):
+        """The part of each syndrome due to symbols, a run of the word whose
+        last symbol is at the coefficient of x^power"""
+        coder = self.coder
+        b = coder.b
+        part = coder._syndrome_list(symbols)
+        if power:
+            exptable = coder.exptable
+            part = [s * exptable[l * power % (b-1)] % b
+                    for l, s in enumerate(part, 1)]
+        return part
+
+    def _index(self, i, length):
+        if i < 0:
+            i += length
+        if not 0 <= i < length:
+            raise IndexError("symbol index out of range")
+        return i
+
+    def replace(self, i, symbol):
+        "Sets the symbol at index i, symbol may be a character or a value"
+        i = self._index(i, len(self.symbols))
+        value = self._value(symbol)
+        delta = value - self.symbols[i]
+        if not delta:
+            return
+        self.symbols[i] = value
+
+        b = self.coder.b
+        exptable = self.coder.exptable
+        j = len(self.symbols) - 1 - i
+        self.syndromes = [(s + delta * exptable[l * j % (b-1)]) % b
+                for l, s in enumerate(self.syndromes, 1)]
+
+    def _split(self, i):
+        """Returns the parts of the syndromes due to the symbols before index
+        i and due to the rest, computing only the shorter one"""
+        b = self.coder.b
+        length = len(self.symbols)
+        if i <= length - i:
+            head = self._contribution(self.symbols[:i], length - i)
+            tail = [(s - h) % b for s, h in zip(self.syndromes, head)]
+        else:
+            tail = self._contribution(self.symbols[i:], 0)
+            head = [(s - t) % b for s, t in zip(self.syndromes, tail)]
+        return head, tail
+
+    def insert(self, i, symbol):
+        "Inserts a symbol before index i, i == len() appends"
+        length = len(self.symbols)
+        if length >= self.coder.n:
+            raise ValueError("Codeword length is max %d" % self.coder.n)
+        if i < 0:
+            i += length
+        i = max(0, min(i, length))
+        value = self._value(symbol)
+
+        coder = self.coder
+        b = coder.b
+        exptable = coder.exptable
+        head, tail = self._split(i)
+        # The head moves up one power, the new symbol sits just above the tail
+        j = length - i
+        self.syndromes = [(h * exptable[l % (b-1)] + value * exptable[l * j % (b-1)] + t) % b
+                for l, h, t in zip(xrange(1, len(head)+1), head, tail)]
+        self.symbols.insert(i, value)
+
+    def delete(self, i):
+        "Removes the symbol at index i"
+        length = len(self.symbols)
+        i = self._index(i, length)
+
+        coder = self.coder
+        b = coder.b
+        exptable = coder.exptable
+        head, tail = self._split(i)
+        # The tail includes the deleted symbol, take it out and move the
+        # head down one power
+        j = length - 1 - i
+        value = self.symbols[i]
+        self.syndromes = [(h * exptable[-l % (b-1)] + t - value * exptable[l * j % (b-1)]) % b
+                for l, h, t in zip(xrange(1, len(head)+1), head, tail)]
+        del self.symbols[i]
+
+    def __repr__(self):
+        return "%s(%r, valid=%r)" % (self.__class__.__name__, self.code,
+                self.valid)
+
+# vim: sw=4 ts=4 et ai si bg=dark
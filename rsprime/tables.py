@@ -0,0 +1,126 @@
+# encoding: UTF-8
+# Copyright (c) 2014 Ryan Castellucci <code@ryanc.org>
+# See LICENSE.txt for license terms
+
+import ctypes
+import mmap
+import struct
+import sys
+from array import array
+
+"""Precomputed RSCoder tables in a compact, versioned binary file.
+
+Building an RSCoder means finding a generator of the field, multiplying out
+the generator polynomial and filling the inverse and α-power tables. For
+large primes that is most of the start up cost. dump_tables() writes all of
+it to a file, and load_tables() maps that file with mmap, so that every
+process loading the same file shares the same pages. The tables are ctypes
+arrays laid over the mapping, indexed as fast as a tuple with nothing copied.
+
+File layout (all integers little endian):
+
+    magic 'RSPT', version (H), table typecode (c), padding (x),
+    b, n, k, α (4 x I)
+    g      n-k+1 entries, coefficients in order of decreasing power
+    h      k+1 entries, coefficients in order of decreasing power
+    inv    b entries, inv[0] is stored as 0
+    exp    b-1 entries, exp[i] = α^i
+
+Table entries are 'H' when every value fits in 16 bits and 'I' otherwise.
+"""
+
+MAGIC = 'RSPT'
+VERSION = 2
+
+_header = struct.Struct('<4sHcxIIII')
+
+# Signed for 'I', Python 2 returns unsigned 32 bit values as longs, which are
+# slow to compute with. Every table has b entries or fewer, so b is far below
+# 2^31 in practice, load_tables() checks.
+_ctypes = {'H': ctypes.c_uint16, 'I': ctypes.c_int32}
+
+def _section(buf, offset, length, typecode):
+    """Returns the length integers at offset in buf, a mapping of a table
+    file, as a ctypes array sharing its memory. A big endian host gets a
+    byteswapped copy instead."""
+    if sys.byteorder != 'little':
+        data = array(typecode, buf[offset:offset + length * array(typecode).itemsize])
+        data.byteswap()
+        return data
+    return (_ctypes[typecode] * length).from_buffer(buf, offset)
+
+class CoderTables(object):
+    """The tables of an RSCoder as loaded by load_tables(). Pass it to
+    RSCoder(b, n, k, tables=...) to skip building them."""
+    def __init__(self, b, n, k, a, g, h, invtable, exptable):
+        self.b = b
+        self.n = n
+        self.k = k
+        self.a = a
+        self.g = g
+        self.h = h
+        self.invtable = invtable
+        self.exptable = exptable
+
+    def __repr__(self):
+        return "%s(b=%d, n=%d, k=%d)" % (self.__class__.__name__,
+                self.b, self.n, self.k)
+
+def _typecode(b):
+    return 'H' if b <= 0xffff else 'I'
+
+def dump_tables(coder, path):
+    """Writes the precomputed tables of coder to the file at path"""
+    b, n, k = coder.b, coder.n, coder.k
+    tc = _typecode(b)
+
+    inv = [int(x or 0) for x in coder.PFint.invtable[b]]
+    sections = (
+        [int(x) for x in coder.g.coefficients],
+        [int(x) for x in coder.h.coefficients],
+        inv,
+        list(coder.exptable),
+    )
+
+    with open(path, 'wb') as f:
+        f.write(_header.pack(MAGIC, VERSION, tc, b, n, k, int(coder.a)))
+        for values in sections:
+            data = array(tc, values)
+            if sys.byteorder != 'little':
+                data.byteswap()
+            f.write(data.tostring())
+
+def load_tables(path):
+    """Maps the table file at path and returns a CoderTables"""
+    with open(path, 'rb') as f:
+        # ctypes can only lay arrays over writable buffers. A copy on write
+        # mapping is one, and as long as nothing writes to it, its pages are
+        # the file's, shared with every other process.
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    if len(buf) < _header.size:
+        raise ValueError("%s is not an RSCoder table file" % path)
+    magic, version, tc, b, n, k, a = _header.unpack_from(buf, 0)
+    if magic != MAGIC:
+        raise ValueError("%s is not an RSCoder table file" % path)
+    if version != VERSION:
+        raise ValueError("Unsupported table file version %d" % version)
+    if tc != _typecode(b):
+        raise ValueError("Table typecode %r does not match base %d" % (tc, b))
+    if b >= 1 << 31:
+        raise ValueError("Base %d is too large for a table file" % b)
+
+    size = struct.calcsize('<' + tc)
+    lengths = (n-k+1, k+1, b, b-1)
+    if len(buf) != _header.size + size * sum(lengths):
+        raise ValueError("%s is truncated or corrupt" % path)
+
+    tables = []
+    offset = _header.size
+    for length in lengths:
+        tables.append(_section(buf, offset, length, tc))
+        offset += size * length
+
+    return CoderTables(b, n, k, a, *tables)
+
+# vim: sw=4 ts=4 et ai si bg=dark
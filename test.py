@@ -1,7 +1,12 @@
 import unittest
 import itertools
+import os
+import shutil
+import tempfile
+import random
+import threading
 
-from rsprime import PFint, Polynomial, RSCoder
+from rsprime import PFint, Polynomial, SparsePolynomial, RSCoder, DecodeError, InterleavedCoder
 
 PF59int = PFint(59)
 
@@ -42,6 +47,16 @@ class TestPFint(unittest.TestCase):
         self.assertEqual(b.inverse(), 46)
         self.assertEqual(b * 46, 1)
 
+    def test_field_class(self):
+        """There is one cached subclass per prime, shared by all of its
+        elements, and elements carry no instance dict"""
+        self.assertTrue(PFint(59) is PF59int)
+        self.assertTrue(type(PF59int(3)) is PF59int)
+        self.assertTrue(type(PF59int(3) * PF59int(40)) is PF59int)
+        self.assertEqual(PF59int(3).p, 59)
+        self.assertFalse(hasattr(PF59int(3), '__dict__'))
+        self.assertRaises(ValueError, PFint, 58)
+
     def test_fermats_theorem(self):
         for x in range(1,59):
             self.assertEqual(PF59int(x)**58, 1)
@@ -120,6 +135,26 @@ class TestRSdecoding(unittest.TestCase):
             self.assertEqual(self.string, decode)
 
 
+    def test_single_error_table(self):
+        """Single errors are resolved by the syndrome table, at every
+        position and for codes given without their leading zeros"""
+        self.assertEqual(len(self.coder.single_errors), 58)
+        code = self.coder.encode(self.string)
+        symbols = self.coder.mapper.decode(code)
+        for i in xrange(len(symbols)):
+            r = list(symbols)
+            r[i] = (r[i] + 7) % 59
+            syn = self.coder._syndrome_list(r)
+            j, e = self.coder._single_error(syn)
+            self.assertEqual((j, e), (len(r) - 1 - i, 7))
+            self.assertEqual(self.coder.decode(self.coder.mapper.encode(r)),
+                    self.string)
+
+        r = list(symbols)
+        r[3] = (r[3] + 1) % 59
+        r[9] = (r[9] + 1) % 59
+        self.assertEqual(self.coder._single_error(self.coder._syndrome_list(r)), None)
+
     def test_6err(self):
         """Tests if 16 byte errors still decodes"""
         errors = [5, 6, 12, 13, 38, 40]
@@ -143,9 +178,804 @@ class TestRSdecoding(unittest.TestCase):
             r[e] = (r[e] + 50) % 256
 
         r = "".join(self.coder.mapper.encode(x) for x in r)
-        decode = self.coder.decode(r)
+        try:
+            decode = self.coder.decode(r)
+        except DecodeError:
+            return
         self.assertNotEqual(self.string, decode)
 
+    def test_early_failure(self):
+        """Words with too many errors raise DecodeError instead of coming
+        back miscorrected"""
+        coder = RSCoder(59,20,10)
+        rnd = random.Random(8)
+        code = coder.encode("123456789a", nostrip=True)
+        failures = 0
+        for _ in xrange(30):
+            r = coder.mapper.decode(code)
+            for e in rnd.sample(xrange(20), 8):
+                r[e] = (r[e] + rnd.randint(1, 58)) % 59
+            try:
+                coder.decode(coder.mapper.encode(r))
+            except DecodeError:
+                failures += 1
+        # A shortened code lands most bad words outside its positions
+        self.assertTrue(failures > 20)
+
+        sz = Polynomial(map(coder.PFint, (0,) * 4 + (1,) * 7))
+        self.assertRaises(DecodeError, coder._locate, sz)
+
+    def test_outside_alphabet(self):
+        """Characters outside the alphabet are refused, not corrected"""
+        code = self.coder.encode("1Ah56CfeZSXA")
+        bad = code.replace("Z", "!")
+        self.assertRaises(ValueError, self.coder.verify, bad)
+        self.assertRaises(ValueError, self.coder.decode, bad)
+        coder = RSCoder(37,36,20)
+        self.assertRaises(ValueError, coder.decode, "Z" + coder.encode("abc"))
+
+
+class TestRStables(unittest.TestCase):
+    def setUp(self):
+        self.coder = RSCoder(59,58,46)
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'rs59.tables')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_roundtrip(self):
+        """Tests that a coder loaded from a table file has the same tables
+        and produces the same codewords"""
+        self.coder.save_tables(self.path)
+        loaded = RSCoder.from_tables(self.path)
+
+        self.assertEqual((loaded.b, loaded.n, loaded.k), (59, 58, 46))
+        self.assertEqual(loaded.a, self.coder.a)
+        self.assertEqual(loaded.g, self.coder.g)
+        self.assertEqual(loaded.h, self.coder.h)
+        self.assertEqual(tuple(loaded.exptable), self.coder.exptable)
+        # Plain ints, straight from the mapping
+        self.assertTrue(type(loaded.exptable[-1]) is int)
+        self.assertEqual(loaded.exptable[-1], self.coder.exptable[-1])
+
+        code = self.coder.encode("818878", nostrip=True)
+        self.assertEqual(loaded.encode("818878", nostrip=True), code)
+        self.assertEqual(loaded.decode(code[:5] + "1" + code[6:]), "818878")
+
+    def test_bad_file(self):
+        with open(self.path, 'wb') as f:
+            f.write('not a table file at all')
+        self.assertRaises(ValueError, RSCoder.from_tables, self.path)
+
+    def test_mismatch(self):
+        self.coder.save_tables(self.path)
+        from rsprime.tables import load_tables
+        tables = load_tables(self.path)
+        self.assertRaises(ValueError, RSCoder, 59, 58, 52, tables=tables)
+
+
+class TestDecoderBackends(unittest.TestCase):
+    def _check(self, b, n, k):
+        bm = RSCoder(b, n, k)
+        eu = RSCoder(b, n, k, decoder='euclidean')
+        rnd = random.Random(n * k)
+        message = "".join(rnd.choice(bm.mapper.encode(range(1, b)))
+                for _ in xrange(k))
+        code = bm.encode(message, nostrip=True)
+        symbols = bm.mapper.decode(code)
+
+        for errors in xrange((n-k)//2 + 1):
+            r = list(symbols)
+            for e in rnd.sample(xrange(n), errors):
+                r[e] = (r[e] + rnd.randint(1, b-1)) % b
+            r = bm.mapper.encode(r)
+
+            sz = bm._syndromes(Polynomial(bm.PFint(x) for x in bm.mapper.decode(r)))
+            for coder in (bm, eu):
+                sigma, omega = coder.decoder.solve(coder, sz)
+                self.assertEqual(sigma.degree(), errors)
+            self.assertEqual(bm._chien_search(bm.decoder.solve(bm, sz)[0]),
+                    eu._chien_search(eu.decoder.solve(eu, sz)[0]))
+            self.assertEqual(bm.decode(r), message)
+            self.assertEqual(eu.decode(r), message)
+
+    def test_even(self):
+        self._check(59, 30, 20)
+
+    def test_odd(self):
+        self._check(59, 20, 13)
+
+    def test_too_many_errors(self):
+        """With n-k odd both backends give up on the same words"""
+        bm = RSCoder(59, 58, 49)
+        eu = RSCoder(59, 58, 49, decoder='euclidean')
+        rnd = random.Random(5)
+        for _ in xrange(150):
+            message = [rnd.randrange(59) for _ in xrange(49)]
+            r = bm.mapper.decode(bm.encode(bm.mapper.encode(message), nostrip=True))
+            for e in rnd.sample(xrange(58), rnd.randint(5, 7)):
+                r[e] = (r[e] + rnd.randint(1, 58)) % 59
+            r = bm.mapper.encode(r)
+            results = []
+            for coder in (bm, eu):
+                try:
+                    results.append(coder.decode(r, nostrip=True))
+                except DecodeError:
+                    results.append(None)
+            self.assertEqual(results[0], results[1])
+
+    def test_unknown(self):
+        self.assertRaises(ValueError, RSCoder, 59, 58, 46, decoder='nope')
+
+
+class TestNTT(unittest.TestCase):
+    def test_transform(self):
+        """The transform evaluates at every power of alpha"""
+        from rsprime.ntt import NTT, factorize
+        self.assertEqual(factorize(36), [2, 2, 3, 3])
+        self.assertEqual(factorize(58), [2, 29])
+        for b in (17, 37, 59):
+            coder = RSCoder(b, b-1, b-7)
+            ntt = NTT(b, coder.exptable)
+            rnd = random.Random(b)
+            a = [rnd.randrange(b) for _ in xrange(b-1)]
+            poly = Polynomial(map(coder.PFint, reversed(a)))
+            self.assertEqual(ntt.transform(a),
+                    [poly.evaluate(coder.a ** m) for m in xrange(b-1)])
+
+    def test_selection(self):
+        self.assertEqual(RSCoder(59,58,46).ntt, None)
+        self.assertEqual(RSCoder(37,20,14).ntt_syndromes, False)
+        coder = RSCoder(37,36,20)
+        self.assertTrue(coder.ntt_syndromes)
+
+    def test_lazy_check(self):
+        """The transform is checked on first use, not when the coder is made"""
+        from rsprime.ntt import NTT
+        coder = RSCoder(37,36,20)
+        self.assertEqual(coder.ntt.checked, None)
+        code = coder.encode("abc")
+        bad = "x" + code[1:]
+
+        # Threads that use it first all wait for the one check
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(coder.decode(bad)))
+                for _ in xrange(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(results, ["abc"] * 8)
+        self.assertEqual(coder.ntt.checked, True)
+
+        # A transform that is wrong is dropped for the direct kernels
+        coder = RSCoder(37,36,20)
+        coder.ntt = NTT(37, [1] * 36)
+        self.assertEqual(coder.decode(bad), "abc")
+        self.assertEqual(coder.ntt.checked, False)
+        self.assertEqual(coder.kernels['syndromes'], 'direct')
+        self.assertEqual(coder.kernels['roots'], 'direct')
+
+    def test_decode(self):
+        """Decoding through the transforms matches the direct paths"""
+        coder = RSCoder(37,36,20)
+        rnd = random.Random(9)
+        alphabet = coder.mapper.encode(range(1, 37))
+        message = "".join(rnd.choice(alphabet) for _ in xrange(20))
+        code = coder.encode(message, nostrip=True)
+        for errors in (1, 3, 7, 8):
+            r = coder.mapper.decode(code)
+            for e in rnd.sample(xrange(36), errors):
+                r[e] = (r[e] + rnd.randint(1, 36)) % 37
+            self.assertEqual(coder._syndrome_list(r),
+                    coder._syndrome_list_direct(r))
+            self.assertEqual(coder.decode(coder.mapper.encode(r)), message)
+
+
+class TestSWAR(unittest.TestCase):
+    def test_lanes(self):
+        from rsprime.swar import SWAR
+        swar = SWAR(59, 10)
+        a = swar.pack([1, 58, 0, 7])
+        self.assertEqual(swar.unpack(a, 4), [1, 58, 0, 7])
+        s = swar.add(swar.scale(a, 58), swar.pack([3, 3, 3, 3]))
+        self.assertEqual(swar.unpack(s, 4), [61, 3367, 3, 409])
+        self.assertEqual(swar.unpack(swar.reduce(s, 4), 4), [2, 4, 3, 55])
+        self.assertRaises(ValueError, SWAR, 2147483647, 10)
+
+    def test_matrix(self):
+        """A packed product gives every dot product, for short vectors too"""
+        from rsprime.swar import SWAR
+        rnd = random.Random(8)
+        swar = SWAR(59, 24)
+        rows = [[rnd.randrange(59) for _ in xrange(12)] for _ in xrange(5)]
+        matrix = swar.matrix(rows)
+        for length in (12, 7, 1):
+            v = [58] * (length - 1) + [rnd.randrange(59)]
+            self.assertEqual(matrix * swar.pack(v),
+                    [sum(x * y for x, y in zip(row[12-length:], v)) % 59
+                        for row in rows])
+
+    def test_engine(self):
+        """The swar engine encodes and decodes like the default one"""
+        coder = RSCoder(59,30,20)
+        swar = RSCoder(59,30,20, engine='swar')
+        rnd = random.Random(10)
+        for _ in xrange(50):
+            symbols = [rnd.randrange(59) for _ in xrange(rnd.randint(1, 20))]
+            message = coder.mapper.encode(symbols)
+            code = coder.encode(message)
+            self.assertEqual(swar.encode(message), code)
+            self.assertEqual(swar.encode(message, nostrip=True),
+                    coder.encode(message, nostrip=True))
+            r = coder.mapper.decode(code)
+            for e in rnd.sample(xrange(len(r)), min(5, len(r))):
+                r[e] = (r[e] + rnd.randint(1, 58)) % 59
+            self.assertEqual(swar._syndrome_list(r),
+                    coder._syndrome_list_direct(r))
+        self.assertRaises(ValueError, RSCoder, 59, 30, 20, engine='simd')
+
+        # Characters outside the alphabet are refused, not packed
+        bad = code[:3] + " " + code[4:]
+        self.assertRaises(ValueError, swar.decode, bad)
+        self.assertRaises(ValueError, swar.syndrome_state, bad)
+        self.assertRaises(ValueError, swar._syndrome_list, [1, 59, 2])
+
+
+class TestSymbols(unittest.TestCase):
+    def test_roundtrip(self):
+        """Every kind of sequence encodes and decodes like the string API"""
+        from array import array
+        for engine in ('poly', 'swar'):
+            coder = RSCoder(59,20,14, engine=engine)
+            message = coder.mapper.decode("1Ah56Cfe4SXA")
+            code = coder.mapper.decode(coder.encode("1Ah56Cfe4SXA"))
+            for kind in (list, bytearray, lambda v: str(bytearray(v)),
+                    lambda v: array('B', v), lambda v: array('H', v)):
+                encoded = coder.encode_symbols(kind(message))
+                self.assertEqual(type(encoded), type(kind(message)))
+                self.assertEqual(encoded, kind(code))
+                self.assertTrue(coder.verify_symbols(encoded))
+
+                bad = list(code)
+                bad[0] = (bad[0] + 1) % 59
+                bad[7] = (bad[7] + 30) % 59
+                bad[-1] = (bad[-1] + 2) % 59
+                self.assertFalse(coder.verify_symbols(kind(bad)))
+                self.assertEqual(coder.decode_symbols(kind(bad)), kind(message))
+                self.assertEqual(coder.decode_symbols(kind(code)), kind(message))
+
+    def test_out(self):
+        from array import array
+        coder = RSCoder(59,20,14)
+        message = array('B', coder.mapper.decode("Zz" * 7))
+        code = coder.encode_symbols(message)
+        out = array('H', [0] * 20)
+        self.assertTrue(coder.encode_symbols(message, out) is out)
+        self.assertEqual(list(out), list(code))
+        buf = bytearray(25)
+        coder.decode_symbols(code, memoryview(buf))
+        self.assertEqual(buf[:14], bytearray(message))
+        self.assertRaises(ValueError, coder.encode_symbols, message, bytearray(5))
+        self.assertRaises(ValueError, coder.encode_symbols, bytearray([59]))
+        self.assertRaises(ValueError, coder.encode_symbols, [-1, 3])
+
+        # Values past the field and words without room for the parity
+        bad = bytearray(code)
+        bad[2] += 59
+        self.assertRaises(ValueError, coder.verify_symbols, bad)
+        self.assertRaises(ValueError, coder.decode_symbols, bad)
+        self.assertRaises(ValueError, coder.verify_symbols, [1, 2])
+        self.assertRaises(ValueError, coder.decode_symbols, [1, 2])
+
+
+class TestRecover(unittest.TestCase):
+    def test_recover(self):
+        """Any n-k erasures are filled in, for shortened words too, and
+        repeated patterns come from the cache"""
+        coder = RSCoder(59,30,20)
+        rnd = random.Random(14)
+        for length in (30, 17, 11):
+            message = [rnd.randrange(1, 59)] + [rnd.randrange(59)
+                    for _ in xrange(length - 11)]
+            code = coder.mapper.decode(coder.encode(coder.mapper.encode(message)))
+            self.assertEqual(len(code), length)
+            for count in (1, 4, 10):
+                erased = rnd.sample(xrange(length), count)
+                r = list(code)
+                for i in erased:
+                    r[i] = rnd.randrange(59)
+                self.assertEqual(coder.recover(r, erased), code)
+                self.assertEqual(coder.recover(r, erased), code)
+
+        stats = coder.erasure_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (9, 9))
+
+        code = coder.encode("1Ah56Cfe4SXA")
+        bad = "?" + code[1:5] + "??" + code[7:]
+        self.assertEqual(coder.recover(bad, [0, 5, 6]), code)
+        self.assertEqual(coder.recover(code, []), code)
+        self.assertRaises(DecodeError, coder.recover, bad, range(11))
+        self.assertRaises(IndexError, coder.recover, bad, [len(bad)])
+
+
+class HexMapper(object):
+    "A mapper that only has what RSCoder needs, for base 17"
+    alphabet = '0123456789abcdefg'
+
+    def encode(self, data):
+        if isinstance(data, int):
+            return self.alphabet[data]
+        return ''.join(self.alphabet[x] for x in data)
+
+    def decode(self, data):
+        if len(data) == 1:
+            return self.alphabet.find(data)
+        return [self.alphabet.find(c) for c in data]
+
+    def pad(self, s, w):
+        return s.rjust(w, '0')
+
+    def strip(self, s):
+        return s.lstrip('0')
+
+
+class TestScan(unittest.TestCase):
+    def test_scan(self):
+        """Codewords are found at their offsets, and windows the rolling
+        syndromes call valid really are codewords"""
+        import StringIO
+        from rsprime.scanner import scan
+        coder = RSCoder(59,20,14)
+        rnd = random.Random(15)
+        alphabet = coder.mapper.encode(range(59))
+        codes = [coder.encode("".join(rnd.choice(alphabet) for _ in xrange(14)),
+            nostrip=True) for _ in xrange(3)]
+        noise = lambda n: "".join(rnd.choice(alphabet + " \n#") for _ in xrange(n))
+        text = noise(50) + " " + codes[0] + codes[1] + noise(30) + "#" + codes[2]
+        expected = [51, 71, 51 + 40 + 31]
+
+        found = list(coder.scan(text))
+        self.assertEqual(found, expected)
+        self.assertEqual(list(scan(coder, StringIO.StringIO(text), 20,
+            chunk_size=7)), expected)
+        for offset in found:
+            self.assertTrue(coder.verify(text[offset:offset+20]))
+
+        bad = text[:55] + ("Z" if text[55] != "Z" else "Y") + text[56:]
+        self.assertEqual(list(coder.scan(bad)), expected[1:])
+        self.assertTrue(51 in coder.scan(bad, correctable=True))
+
+        # Codes printed without their leading zeros
+        short = coder.encode("abc")
+        self.assertEqual(list(coder.scan("##" + short + "##", len(short))), [2])
+
+    def test_custom_mapper(self):
+        """Any mapper with encode and decode will do"""
+        coder = RSCoder(17,16,10, mapper=HexMapper())
+        code = coder.encode("1234abcdef")
+        self.assertEqual(list(coder.scan("xyz" + code + "x")), [3])
+
+
+class TestMint(unittest.TestCase):
+    def encode_int(self, coder, x, nostrip=False):
+        digits = []
+        while x:
+            x, d = divmod(x, coder.b)
+            digits.insert(0, d)
+        message = coder.mapper.encode(digits or [0])
+        return coder.encode(message, nostrip=nostrip)
+
+    def test_range(self):
+        """Minted codes match encoding each integer, across carries"""
+        coder = RSCoder(59,20,14)
+        start = 59 ** 3 - 70
+        self.assertEqual(list(coder.mint_range(start, 150)),
+                [self.encode_int(coder, x) for x in xrange(start, start + 150)])
+        self.assertEqual(list(coder.mint_range(0, 3, nostrip=True)),
+                [self.encode_int(coder, x, True) for x in xrange(3)])
+
+    def test_whole_space(self):
+        coder = RSCoder(7,6,2)
+        self.assertEqual(list(coder.mint_range(0, 49)),
+                [self.encode_int(coder, x) for x in xrange(49)])
+        self.assertRaises(ValueError, list, coder.mint_range(0, 50))
+
+
+class TestCodegen(unittest.TestCase):
+    def test_engine(self):
+        """The generated encoder matches the Polynomial one and is shared
+        between coders of the same code"""
+        coder = RSCoder(59,30,20, engine='codegen')
+        plain = RSCoder(59,30,20)
+        rnd = random.Random(16)
+        for _ in xrange(50):
+            symbols = [rnd.randrange(59) for _ in xrange(rnd.randint(1, 20))]
+            message = plain.mapper.encode(symbols)
+            self.assertEqual(coder.encode(message), plain.encode(message))
+            self.assertEqual(coder.encode(message, nostrip=True),
+                    plain.encode(message, nostrip=True))
+        self.assertTrue("% 59" in coder.codegen_parity.source)
+        self.assertTrue(RSCoder(59,30,20, engine='codegen').codegen_parity
+                is coder.codegen_parity)
+
+    def test_one_parity_symbol(self):
+        from rsprime.codegen import parity_function
+        coder = RSCoder(59,20,19)
+        func = parity_function(59, coder.generator_taps)
+        for message in ([], [1], [58] * 19, range(19)):
+            self.assertEqual(func(message), coder._parity_direct(message))
+
+
+class TestAutotune(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'profile.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_profile(self):
+        """Calibration picks the fastest kernel of each operation and is
+        reused from the profile file"""
+        import json
+        coder = RSCoder(37,36,20, engine='auto', profile=self.path)
+        for op, times in coder.profile['timings'].items():
+            self.assertEqual(coder.kernels[op], min(times, key=times.get))
+        self.assertTrue(set(['poly', 'int']) <= set(coder.profile['timings']['encode']))
+        with open(self.path) as f:
+            self.assertEqual(json.load(f)['37,36,20']['kernels'], coder.kernels)
+
+        again = RSCoder(37,36,20, engine='auto', profile=self.path)
+        self.assertEqual(again.kernels, coder.kernels)
+        self.assertEqual(again.profile['timings'], coder.profile['timings'])
+
+        plain = RSCoder(37,36,20)
+        rnd = random.Random(13)
+        for _ in xrange(20):
+            message = plain.mapper.encode([rnd.randrange(37) for _ in xrange(20)])
+            code = plain.encode(message)
+            self.assertEqual(coder.encode(message), code)
+            r = coder.mapper.decode(code.rjust(36, "0"))
+            for e in rnd.sample(xrange(36), 8):
+                r[e] = (r[e] + 1) % 37
+            self.assertEqual(coder.decode(coder.mapper.encode(r)), message.lstrip("0"))
+
+    def test_shared_file(self):
+        """A garbled profile doesn't break the coder, and entries written by
+        others meanwhile are kept"""
+        import json
+        from rsprime.autotune import add_profile
+        with open(self.path, 'w') as f:
+            f.write('{"37,36,20": {"kernels": ')
+        coder = RSCoder(37,36,20, engine='auto', profile=self.path)
+        add_profile(self.path, '1,2,3', {'kernels': {}})
+        RSCoder(59,20,14, engine='auto', profile=self.path)
+        with open(self.path) as f:
+            self.assertEqual(sorted(json.load(f)), ['1,2,3', '37,36,20', '59,20,14'])
+        self.assertEqual(sorted(os.listdir(self.tmpdir)),
+                ['profile.json', 'profile.json.lock'])
+
+    def test_kernels(self):
+        coder = RSCoder(59,58,46)
+        self.assertEqual(coder.kernels,
+                {'encode': 'poly', 'syndromes': 'direct', 'roots': 'direct'})
+        self.assertEqual(RSCoder(59,58,46, engine='swar').kernels['syndromes'], 'swar')
+        self.assertRaises(ValueError, coder._use_kernels,
+                {'encode': 'int', 'syndromes': 'fft', 'roots': 'direct'})
+        coder._use_kernels({'encode': 'int', 'syndromes': 'swar', 'roots': 'ntt'})
+        self.assertEqual(coder.swar_parity.rows, 12)
+
+        # Only offered where the search would actually use the transform
+        from rsprime.autotune import available
+        self.assertEqual(available(RSCoder(59,58,46))['roots'], ['direct'])
+        self.assertEqual(available(RSCoder(37,36,20))['roots'], ['direct', 'ntt'])
+
+
+class TestInterleave(unittest.TestCase):
+    def setUp(self):
+        self.coder = InterleavedCoder(RSCoder(59,20,14), 4)
+        rnd = random.Random(12)
+        alphabet = self.coder.coder.mapper.encode(range(1, 59))
+        self.message = "".join(rnd.choice(alphabet) for _ in xrange(50))
+
+    def test_layout(self):
+        code = self.coder.encode(self.message)
+        self.assertEqual(len(code), 80)
+        self.assertEqual(code[:56], self.message.rjust(56, "0"))
+        self.assertTrue(self.coder.verify(code))
+        for c in xrange(4):
+            self.assertTrue(self.coder.coder.verify(code[c::4]))
+        self.assertEqual(self.coder.decode(code), self.message)
+        self.assertEqual(self.coder.decode(code, nostrip=True),
+                self.message.rjust(56, "0"))
+
+    def test_burst(self):
+        """Any burst of up to depth*t symbols is corrected"""
+        code = self.coder.encode(self.message)
+        for start in xrange(0, 80 - 12):
+            bad = code[:start] + "Z" * 12 + code[start+12:]
+            self.assertEqual(self.coder.decode(bad), self.message)
+
+        bad = "Z" * 16 + code[16:]
+        self.assertFalse(self.coder.verify(bad))
+        self.assertRaises(ValueError, self.coder.encode, "1" * 57)
+
+
+class TestSyndromeState(unittest.TestCase):
+    def setUp(self):
+        self.coder = RSCoder(59,30,20)
+        self.code = self.coder.encode("1Ah56Cfe4SXA")
+
+    def test_edits(self):
+        """Syndromes after any sequence of edits match a fresh computation"""
+        state = self.coder.syndrome_state(self.code)
+        self.assertTrue(state.valid)
+        rnd = random.Random(6)
+        for _ in xrange(200):
+            op = rnd.choice(('replace', 'insert', 'delete'))
+            if op == 'replace' or (op == 'insert' and len(state) == 30):
+                state.replace(rnd.randrange(len(state)), rnd.randrange(59))
+            elif op == 'insert' or len(state) == 1:
+                state.insert(rnd.randint(0, len(state)), rnd.randrange(59))
+            else:
+                state.delete(rnd.randrange(len(state)))
+            self.assertEqual(state.syndromes,
+                    self.coder._syndrome_list(state.symbols))
+
+    def test_status(self):
+        state = self.coder.syndrome_state(self.code)
+        state.replace(2, 'Z')
+        state.replace(-1, '0' if self.code[-1] != '0' else '1')
+        self.assertFalse(state.valid)
+        self.assertTrue(state.correctable)
+        fixes = state.errors()
+        self.assertEqual([i for i, _ in fixes], [2, len(self.code) - 1])
+        for i, value in fixes:
+            state.replace(i, value)
+        self.assertTrue(state.valid)
+        self.assertEqual(state.code, self.code)
+
+        # Typing the code in one symbol at a time
+        state = self.coder.syndrome_state(self.code[0])
+        for c in self.code[1:]:
+            state.insert(len(state), c)
+        self.assertTrue(state.valid)
+
+        for i in xrange(6):
+            state.replace(i, (state.symbols[i] + 1) % 59)
+        self.assertFalse(state.correctable)
+
+
+class TestThreads(unittest.TestCase):
+    def test_many(self):
+        """A single coder shared by a thread pool gives the same results as
+        one used serially"""
+        coder = RSCoder(59,20,14)
+        rnd = random.Random(3)
+        alphabet = coder.mapper.encode(range(1, 59))
+        messages = ["".join(rnd.choice(alphabet) for _ in xrange(14))
+                for _ in xrange(40)]
+
+        codes = coder.encode_many(messages, workers=4)
+        self.assertEqual(codes, [coder.encode(m) for m in messages])
+
+        bad = []
+        for code in codes:
+            r = coder.mapper.decode(code)
+            for e in rnd.sample(xrange(20), 2):
+                r[e] = (r[e] + 1) % 59
+            bad.append(coder.mapper.encode(r))
+        self.assertEqual(coder.decode_many(bad, workers=4), messages)
+
+    def test_no_lazy_fill(self):
+        """Creating a field fills its element cache and inverse table"""
+        PF61int = PFint(61)
+        self.assertEqual(len(PFint.cache[61]), 61)
+        self.assertEqual(len(PFint.invtable[61]), 61)
+        self.assertRaises(ValueError, PF61int, 61)
+
+
+class TestSidecar(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'records.txt')
+        rnd = random.Random(4)
+        alphabet = RSCoder(59,58,52).mapper.encode(range(59))
+        self.data = "".join("".join(rnd.choice(alphabet)
+            for _ in xrange(rnd.randint(1, 30))) + "\n" for _ in xrange(50))
+        with open(self.path, 'wb') as f:
+            f.write(self.data)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_repair(self):
+        from rsprime.sidecar import protect, repair
+        coder = RSCoder(59,20,14)
+        count = protect(coder, self.path)
+        self.assertEqual(count, len(self.data) - self.data.count("\n"))
+
+        bad = bytearray(self.data)
+        for i in (3, 40, 41, 200, len(bad) - 2):
+            bad[i] = '#' if bad[i] != ord('#') else 'Z'
+        with open(self.path, 'wb') as f:
+            f.write(bad)
+
+        report = repair(self.path, dry_run=True)
+        self.assertEqual(report['fixed'], 5)
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(), str(bad))
+
+        report = repair(self.path)
+        self.assertEqual((report['fixed'], report['failed']), (5, []))
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+
+    def test_zero_in_short_stripe(self):
+        """A lost symbol that was 0 in the last, short stripe is restored"""
+        from rsprime.sidecar import protect, repair
+        with open(self.path, 'wb') as f:
+            f.write('abcdefghijkmnpxy0zq\n')
+        protect(RSCoder(59,58,52), self.path)
+        with open(self.path, 'wb') as f:
+            f.write('abcdefghijkmnpxy#zq\n')
+        report = repair(self.path)
+        self.assertEqual((report['fixed'], report['failed']), (1, []))
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(), 'abcdefghijkmnpxy0zq\n')
+
+    def test_custom_mapper(self):
+        from rsprime.sidecar import protect, repair
+        with open(self.path, 'wb') as f:
+            f.write('0123456789abcdefg\nfedcba\n')
+        protect(RSCoder(17,16,10, mapper=HexMapper()), self.path)
+        with open(self.path, 'wb') as f:
+            f.write('0123456789abcdefg\nfedcbz\n')
+        report = repair(self.path, mapper=HexMapper())
+        self.assertEqual((report['fixed'], report['failed']), (1, []))
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(), '0123456789abcdefg\nfedcba\n')
+
+    def test_resized(self):
+        """Nothing is patched in a file that gained or lost symbols"""
+        from rsprime.sidecar import protect, repair
+        protect(RSCoder(59,20,14), self.path)
+        bad = bytearray(self.data)
+        bad[3] = '#' if bad[3] != ord('#') else 'Z'
+        bad += 'abc'
+        with open(self.path, 'wb') as f:
+            f.write(bad)
+        self.assertRaises(ValueError, repair, self.path)
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(), str(bad))
+
+
+class TestServer(unittest.TestCase):
+    def setUp(self):
+        from rsprime.server import Server
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'rsprime.sock')
+        self.server = Server(self.path, [(59,58,52), (59,20,14)], workers=1)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_pipeline(self):
+        from rsprime.client import connect, RemoteError
+        local = RSCoder(59,20,14)
+        code = local.encode("1Ah56Cfe4SXA")
+        bad = code[:3] + "Z" + code[4:]
+
+        client = connect(self.path, code=(59,20,14))
+        try:
+            self.assertEqual(client.encode("1Ah56Cfe4SXA"), code)
+            results = client.pipeline([('verify', code), ('verify', bad),
+                ('decode', bad), ('decode', bad, True), ('decode', "Z" * 20)])
+            self.assertEqual(results[:4], [True, False, "1Ah56Cfe4SXA",
+                "1Ah56Cfe4SXA".rjust(14, "0")])
+            self.assertTrue(isinstance(results[4], RemoteError))
+        finally:
+            client.close()
+
+        # The first code is the default
+        client = connect(self.path)
+        try:
+            self.assertEqual(client.encode("abc"),
+                    RSCoder(59,58,52).encode("abc"))
+        finally:
+            client.close()
+
+        self.assertEqual(connect(os.path.join(self.tmpdir, 'none')), None)
+
+    def test_not_a_socket(self):
+        """Anything but a dead socket of ours at the path is left alone"""
+        from rsprime.server import Server
+        path = os.path.join(self.tmpdir, 'notasock.txt')
+        with open(path, 'w') as f:
+            f.write('keep me')
+        self.assertRaises(ValueError, Server, path)
+        with open(path) as f:
+            self.assertEqual(f.read(), 'keep me')
+
+    def test_untrusted(self):
+        """Only sockets owned by this user are connected to"""
+        from rsprime.client import connect
+        link = os.path.join(self.tmpdir, 'link')
+        os.symlink(self.path, link)
+        self.assertEqual(connect(link), None)
+        if os.getuid() == 0:
+            os.lchown(self.path, 1, -1)
+            self.assertEqual(connect(self.path), None)
+
+
+class TestLRU(unittest.TestCase):
+    def test_eviction(self):
+        from rsprime.lru import LRUCache
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.stats(), {'hits': 3, 'misses': 1,
+            'evictions': 1, 'size': 2, 'maxsize': 2})
+
+    def test_coder(self):
+        coder = RSCoder(59,58,46, cache_size=8)
+        code = coder.encode("1Ah56Cfe4SXA", nostrip=True)
+        bad = code[:3] + "Z" + code[4:]
+
+        self.assertTrue(coder.verify(code))
+        self.assertTrue(coder.verify(code))
+        self.assertFalse(coder.verify(bad))
+        self.assertEqual(coder.decode(bad), "1Ah56Cfe4SXA")
+        self.assertEqual(coder.decode(bad, nostrip=True),
+                "1Ah56Cfe4SXA".rjust(46, "0"))
+        stats = coder.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (2, 3))
+
+        # Equivalent characters share the entry and come back canonical
+        self.assertEqual(coder.decode(bad.replace("0", "O")), "1Ah56Cfe4SXA")
+        self.assertEqual(coder.cache.stats()['hits'], 3)
+
+        # Empty messages come back like without a cache
+        plain = RSCoder(59,58,46)
+        for r in (coder.encode("0"), plain.encode("0", nostrip=True)):
+            for nostrip in (False, True):
+                self.assertEqual(coder.decode(r, nostrip=nostrip),
+                        plain.decode(r, nostrip=nostrip))
+
+
+class TestLoadgen(unittest.TestCase):
+    def test_corrupt(self):
+        from rsprime.loadgen import corrupt
+        symbols = range(1, 21)
+        r = corrupt(symbols, 59, 3, 2, rnd=random.Random(1))
+        self.assertEqual(sum(1 for x, y in zip(symbols, r) if x != y), 5)
+        self.assertEqual(r.count(0), 2)
+
+        r = corrupt(symbols, 59, 4, burst=True, rnd=random.Random(2))
+        changed = [i for i, (x, y) in enumerate(zip(symbols, r)) if x != y]
+        self.assertEqual(changed, range(changed[0], changed[0] + 4))
+
+    def test_run(self):
+        from rsprime.loadgen import run
+        report = run(59, 20, 14, error_counts=[0, 2], trials=3, seed=5)
+        self.assertEqual([row['errors'] for row in report['rows']], [0, 2])
+        for row in report['rows']:
+            self.assertEqual(row['trials'], 3)
+            self.assertEqual(row['ok'], 3)
+            self.assertTrue(row['p50'] <= row['p99'] <= row['max'])
+
 
 class TestPFPoly(unittest.TestCase):
     """Tests that the Polynomial class works when given PFint objects
@@ -295,5 +1125,39 @@ class TestPolynomial(unittest.TestCase):
         self.assertEqual(p.get_coefficient(8), 9)
         self.assertEqual(p.get_coefficient(9), 0)
 
+class TestSparsePolynomial(unittest.TestCase):
+    def test_mixed(self):
+        """Sparse and dense polynomials give the same results as two dense
+        ones"""
+        dense = Polynomial((1,4,0,3))
+        for terms in ({0: 2}, {2: 5, 6: 1}, {3: -1, 1: 7}):
+            sparse = SparsePolynomial(terms)
+            as_dense = sparse.dense()
+            self.assertEqual((sparse + dense).coefficients,
+                    (as_dense + dense).coefficients)
+            self.assertEqual((dense - sparse).coefficients,
+                    (dense - as_dense).coefficients)
+            self.assertEqual((sparse - dense).coefficients,
+                    (as_dense - dense).coefficients)
+            self.assertEqual((dense * sparse).coefficients,
+                    (dense * as_dense).coefficients)
+            self.assertEqual((sparse * sparse).coefficients,
+                    (as_dense * as_dense).coefficients)
+            self.assertEqual(sparse.evaluate(3), as_dense.evaluate(3))
+            self.assertEqual(sparse.shift(2), as_dense * Polynomial((1,0,0)))
+            self.assertTrue(isinstance(sparse + sparse, SparsePolynomial))
+
+    def test_terms(self):
+        p = SparsePolynomial(x9=4, x5=5, x0=2)
+        self.assertEqual(p.terms, {9: 4, 5: 5, 0: 2})
+        self.assertEqual(str(p), "4x^9 + 5x^5 + 2")
+        self.assertEqual(p.degree(), 9)
+        self.assertEqual(p.get_coefficient(5), 5)
+        self.assertEqual(p.get_coefficient(4), 0)
+        self.assertEqual((p - p).terms, {})
+        self.assertEqual(SparsePolynomial({3: PF59int(1)}) * Polynomial(map(PF59int, (5, 1))),
+                Polynomial(map(PF59int, (5, 1, 0, 0, 0))))
+
+
 if __name__ == "__main__":
     unittest.main()